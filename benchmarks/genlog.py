@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Writes synthetic OBS Studio logs for benchmarking.
+
+A log has the header of the chosen OS, the usual startup sections, a scene
+collection and a number of streaming and recording sessions. The sessions are
+padded with filler output to the target size; drop, lag and audio buffering
+lines are mixed in at the given rates (per 1000 lines). Output is
+deterministic for a given set of options.
+"""
+
+import argparse
+import random
+
+HEADERS = {
+    'windows': [
+        "Platform: Windows",
+        "CPU Name: AMD Ryzen 7 5800X 8-Core Processor",
+        "CPU Speed: 3800MHz",
+        "Physical Cores: 8, Logical Cores: 16",
+        "Physical Memory: 32694MB Total, 18344MB Free",
+        "Windows Version: 10.0 Build 22631 (release: 23H2; revision: 3155; 64-bit)",
+        "Running as administrator: false",
+        "Windows 10/11 Gaming Features:",
+        "\tGame Bar: On",
+        "\tGame DVR: Off",
+        "\tGame DVR Background Recording: Off",
+        "\tGame Mode: On",
+        "\tHardware GPU Scheduler: Off",
+        "Sec. Software Status:",
+        "\tMicrosoft Defender Antivirus: enabled (AV)",
+        "\tWindows Firewall: enabled (FW)",
+        "Current Date/Time: 2024-02-12, 21:14:07",
+        "Browser Hardware Acceleration: true",
+        "Hide OBS windows from screen capture: false",
+        "Qt Version: 6.6.1 (runtime), 6.6.1 (compiled)",
+        "Portable mode: false",
+        "OBS 30.0.2 (64-bit, windows)",
+    ],
+    'mac': [
+        "CPU Name: Apple M1 Pro",
+        "CPU Speed: 2400MHz",
+        "Physical Cores: 10, Logical Cores: 10",
+        "Physical Memory: 16384MB Total",
+        "OS Name: macOS",
+        "OS Version: Version 14.2.1 (Build 23C71)",
+        "Rosetta translation used: false",
+        "Kernel Version: 23.2.0",
+        "hw.model: MacBookPro18,3",
+        "Qt Version: 6.6.1 (runtime), 6.6.1 (compiled)",
+        "Portable mode: false",
+        "OBS 30.0.2 (mac)",
+    ],
+    'linux': [
+        "CPU Name: AMD Ryzen 5 3600 6-Core Processor",
+        "CPU Speed: 3600MHz",
+        "Physical Cores: 6, Logical Cores: 12",
+        "Physical Memory: 15896MB Total, 9824MB Free",
+        "Kernel Version: Linux 6.5.0-15-generic",
+        "Distribution: \"Ubuntu\" \"22.04\"",
+        "Session Type: x11",
+        "Window System: X11.0, Vendor: The X.Org Foundation, Version: 1.21.1",
+        "Qt Version: 6.2.4 (runtime), 6.2.4 (compiled)",
+        "Portable mode: false",
+        "OBS 30.0.2 (linux)",
+    ],
+}
+
+GRAPHICS = {
+    'windows': [
+        "Initializing D3D11...",
+        "Available Video Adapters: ",
+        "\tAdapter 0: NVIDIA GeForce RTX 3070",
+        "\t  Dedicated VRAM: 8415870976",
+        "\t  Driver Version: 31.0.15.4633",
+        "\t  output 0: pos={0, 0}, size={2560, 1440}, attached=true, refresh=144, name=DELL S2721DGF",
+        "Loading up D3D11 on adapter NVIDIA GeForce RTX 3070 (0)",
+        "D3D11 loaded successfully, feature level used: b000",
+    ],
+    'mac': [
+        "Initializing OpenGL...",
+        "Loading up OpenGL on adapter Apple Apple M1 Pro",
+        "OpenGL loaded successfully, version 4.1 Metal - 86, shading language 4.10",
+    ],
+    'linux': [
+        "Initializing OpenGL...",
+        "Loading up OpenGL on adapter NVIDIA Corporation NVIDIA GeForce GTX 1660 SUPER/PCIe/SSE2",
+        "OpenGL loaded successfully, version 3.3.0 NVIDIA 535.154.05, shading language 3.30 NVIDIA via Cg compiler",
+    ],
+}
+
+MODULES = {
+    'windows': ["coreaudio-encoder.dll", "decklink.dll", "image-source.dll", "obs-browser.dll", "obs-ffmpeg.dll",
+                "obs-filters.dll", "obs-nvenc.dll", "obs-outputs.dll", "obs-qsv11.dll", "obs-transitions.dll",
+                "obs-websocket.dll", "obs-x264.dll", "text-freetype2.dll", "win-capture.dll", "win-dshow.dll",
+                "win-wasapi.dll"],
+    'mac': ["coreaudio-encoder.plugin", "image-source.plugin", "mac-avcapture.plugin", "mac-capture.plugin",
+            "mac-videotoolbox.plugin", "obs-browser.plugin", "obs-ffmpeg.plugin", "obs-filters.plugin",
+            "obs-outputs.plugin", "obs-transitions.plugin", "obs-websocket.plugin", "obs-x264.plugin"],
+    'linux': ["image-source.so", "linux-alsa.so", "linux-capture.so", "linux-pipewire.so", "linux-pulseaudio.so",
+              "linux-v4l2.so", "obs-browser.so", "obs-ffmpeg.so", "obs-filters.so", "obs-outputs.so",
+              "obs-transitions.so", "obs-websocket.so", "obs-x264.so"],
+}
+
+SOURCE_KINDS = {
+    'windows': ["game_capture", "monitor_capture", "window_capture", "dshow_input", "wasapi_input_capture",
+                "browser_source", "image_source", "text_gdiplus_v2"],
+    'mac': ["screen_capture", "macos-avcapture", "coreaudio_input_capture", "browser_source", "image_source",
+            "text_ft2_source_v2"],
+    'linux': ["xshm_input", "pipewire-screen-capture-source", "v4l2_input", "pulse_input_capture",
+              "browser_source", "image_source", "text_ft2_source_v2"],
+}
+
+FILTER_KINDS = ["noise_suppress_filter_v2", "compressor_filter", "color_filter_v2", "crop_filter"]
+
+FILLER = [
+    "[Media Source 'Intro']: seek to start",
+    "[obs-websocket] [WebSocketServer::onOpen] New WebSocket client has connected from [::1]:{port}",
+    "[obs-websocket] [WebSocketServer::onClose] WebSocket client `[::1]:{port}` has disconnected with code `1001`",
+    "[browser_source: 'Alerts'] [CONSOLE] Alert queue length: {n} (source: https://streamlabs.com/alert-box/v3/{n})",
+    "User switched to scene 'Scene {scene}'",
+    "[win-dshow: 'Webcam'] settings updated: ",
+    "Settings changed (outputs)",
+    "Source 'Display Capture' {n}: monitor_capture_tick: capture reinitialized",
+]
+
+SEPARATOR = "---------------------------------"
+SCENE_SEPARATOR = "------------------------------------------------"
+
+
+def timestamp(ms):
+    return "{:02d}:{:02d}:{:02d}.{:03d}: ".format(ms // 3600000 % 24, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+
+def startup(os, scenes, sources, rnd):
+    yield from HEADERS[os]
+    yield SEPARATOR
+    yield "audio settings reset:"
+    yield "\tsamples per sec: 48000"
+    yield "\tspeakers:        2"
+    yield "\tmax buffering:   960 milliseconds"
+    yield "\tbuffering type:  dynamically increasing"
+    yield SEPARATOR
+    yield from GRAPHICS[os]
+    yield SEPARATOR
+    yield from videoSettings("1920x1080", "60")
+    yield SEPARATOR
+    yield "Loaded Modules:"
+    for module in MODULES[os]:
+        yield "  " + module
+    yield SEPARATOR
+    yield "==== Startup complete ==============================================="
+    yield "All scene data cleared"
+    yield SCENE_SEPARATOR
+    yield "Switched to scene 'Scene 1'"
+    yield SCENE_SEPARATOR
+    yield "Loaded scenes:"
+    kinds = SOURCE_KINDS[os]
+    for scene in range(1, scenes + 1):
+        yield "- scene 'Scene {}':".format(scene)
+        for source in range(sources):
+            kind = kinds[rnd.randrange(len(kinds))]
+            yield "    - source: '{} {}' ({})".format(kind.replace('_', ' ').title(), source + 1, kind)
+            if rnd.random() < 0.2:
+                filter = FILTER_KINDS[rnd.randrange(len(FILTER_KINDS))]
+                yield "        - filter: '{}' ({})".format(filter.replace('_', ' ').title(), filter)
+    yield SCENE_SEPARATOR
+
+
+def videoSettings(output, fps):
+    yield "video settings reset:"
+    yield "\tbase resolution:   1920x1080"
+    yield "\toutput resolution: {}".format(output)
+    yield "\tdownscale filter:  Bicubic"
+    yield "\tfps:               {}/1".format(fps)
+    yield "\tformat:            NV12"
+    yield "\tYUV mode:          Rec. 709/Partial"
+
+
+def sessionStart(number, recording):
+    yield SEPARATOR
+    yield "[x264 encoder: 'simple_video_stream'] preset: veryfast"
+    yield "[x264 encoder: 'simple_video_stream'] settings:"
+    yield "\trate_control: CBR"
+    yield "\tbitrate:      6000"
+    yield "\tbuffer size:  6000"
+    yield "\tcrf:          23"
+    yield "\tfps_num:      60"
+    yield "\tfps_den:      1"
+    yield "\twidth:        1920"
+    yield "\theight:       1080"
+    yield "\tkeyint:       250"
+    yield ""
+    yield "[FFmpeg aac encoder: 'simple_aac'] bitrate: 160, channels: 2, channel_layout: stereo"
+    yield "[rtmp stream: 'simple_stream'] Connecting to RTMP URL rtmp://live.twitch.tv/app..."
+    yield "[rtmp stream: 'simple_stream'] Interface: Intel(R) Ethernet Controller I225-V (ethernet, 2500 mbps)"
+    yield "[rtmp stream: 'simple_stream'] Connection to rtmp://live.twitch.tv/app (192.0.2.{}) successful".format(number % 250 + 1)
+    yield "==== Streaming Start ==============================================="
+    if recording:
+        yield "[ffmpeg muxer: 'simple_file_output'] Writing file 'C:/Users/user/Videos/2024-02-12 21-{:02d}-00.mkv'...".format(number % 60)
+        yield "==== Recording Start ==============================================="
+
+
+def sessionEnd(frames, drops, lags, skipped, recording):
+    yield "[rtmp stream: 'simple_stream'] User stopped the stream"
+    yield "Output 'simple_stream': stopping"
+    yield "Output 'simple_stream': Total frames output: {}".format(frames - drops)
+    yield "Output 'simple_stream': Total drawn frames: {} ({} attempted)".format(frames - lags, frames)
+    yield "Output 'simple_stream': Number of lagged frames due to rendering lag/stalls: {} ({:.1f}%)".format(lags, lags * 100 / frames)
+    yield "Output 'simple_stream': Number of dropped frames due to insufficient bandwidth/connection stalls: {} ({:.1f}%)".format(drops, drops * 100 / frames)
+    yield "==== Streaming Stop ================================================"
+    if recording:
+        yield "[ffmpeg muxer: 'simple_file_output'] Output of file 'C:/Users/user/Videos/recording.mkv' stopped"
+        yield "Output 'simple_file_output': stopping"
+        yield "Output 'simple_file_output': Total frames output: {}".format(frames)
+        yield "==== Recording Stop ================================================"
+    yield "Video stopped, number of skipped frames due to encoding lag: {}/{} ({:.1f}%)".format(skipped, frames, skipped * 100 / frames)
+
+
+def sessionBody(size, dropRate, lagRate, bufferingRate, scenes, rnd):
+    """Filler and problem lines of one session, about size bytes (without timestamps)."""
+    written = 0
+    buffering = 0
+    frames = 0
+    drops = 0
+    lags = 0
+    while written < size:
+        frames += 60
+        r = rnd.random() * 1000
+        # Problem lines in the format of the output statistics the checks read
+        if r < dropRate:
+            drops += rnd.randint(1, 60)
+            line = ("Output 'simple_stream': Number of dropped frames due to insufficient bandwidth/connection stalls:"
+                    " {} ({:.1f}%)").format(drops, drops * 100 / frames)
+        elif r < dropRate + lagRate:
+            lags += rnd.randint(1, 30)
+            line = "Output 'simple_stream': Number of lagged frames due to rendering lag/stalls: {} ({:.1f}%)".format(
+                lags, lags * 100 / frames)
+        elif r < dropRate + lagRate + bufferingRate:
+            added = rnd.randint(1, 40)
+            buffering = min(buffering + added, 960)
+            if buffering >= 960:
+                line = "Max audio buffering reached!"
+            else:
+                line = ("adding {} milliseconds of audio buffering, total audio buffering is now {} milliseconds"
+                        " (source: Mic/Aux)").format(added, buffering)
+        else:
+            filler = FILLER[rnd.randrange(len(FILLER))]
+            line = filler.format(port=rnd.randint(50000, 60000), n=rnd.randint(1, 999), scene=rnd.randint(1, max(scenes, 1)))
+        written += len(line) + 15
+        yield line
+
+
+def generateLog(size=1024 * 1024, os='windows', scenes=4, sources=6, sessions=2, recordings=1,
+                dropRate=2.0, lagRate=1.0, bufferingRate=0.5, seed=0):
+    """Yields the lines (with timestamps) of a log of about size bytes."""
+    rnd = random.Random(seed)
+    ms = 0
+    written = 0
+
+    def stamped(lines):
+        nonlocal ms, written
+        for line in lines:
+            ms += rnd.randint(0, 40)
+            line = timestamp(ms) + line
+            written += len(line) + 1
+            yield line
+
+    yield from stamped(startup(os, scenes, sources, rnd))
+    sessions = max(sessions, 1)
+    for number in range(sessions):
+        recording = number < recordings
+        yield from stamped(sessionStart(number, recording))
+        perSession = (size - written) // (sessions - number) - 800
+        bodyRnd = random.Random(rnd.random())
+        body = sessionBody(perSession, dropRate, lagRate, bufferingRate, scenes, bodyRnd)
+        yield from stamped(body)
+        frames = max(int(perSession / 100), 60)
+        yield from stamped(sessionEnd(frames, int(frames * dropRate / 1000), int(frames * lagRate / 1000),
+                                      rnd.randint(0, frames // 100), recording))
+    yield from stamped(["==== Shutting down ==================================================",
+                        "All scene data cleared",
+                        SCENE_SEPARATOR,
+                        "Freeing OBS context data",
+                        "== Profiler Results ============================="])
+
+
+def writeLog(path, **options):
+    """Writes a generated log to path. Returns its size in bytes."""
+    size = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        batch = []
+        for line in generateLog(**options):
+            batch.append(line)
+            if len(batch) >= 4096:
+                size += f.write('\n'.join(batch) + '\n')
+                batch = []
+        size += f.write('\n'.join(batch) + '\n')
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", help="file to write the log to")
+    parser.add_argument("--size", dest='size', default=1, type=float, help="approximate size in MB (default %(default)s)")
+    parser.add_argument("--os", dest='os', default='windows', choices=sorted(HEADERS), help="OS of the header (default %(default)s)")
+    parser.add_argument("--scenes", dest='scenes', default=4, type=int, help="number of scenes (default %(default)s)")
+    parser.add_argument("--sources", dest='sources', default=6, type=int, help="sources per scene (default %(default)s)")
+    parser.add_argument("--sessions", dest='sessions', default=2, type=int, help="streaming sessions (default %(default)s)")
+    parser.add_argument("--recordings", dest='recordings', default=1, type=int,
+                        help="how many of the sessions also record (default %(default)s)")
+    parser.add_argument("--drops", dest='dropRate', default=2.0, type=float, help="dropped frames lines per 1000 (default %(default)s)")
+    parser.add_argument("--lags", dest='lagRate', default=1.0, type=float, help="rendering lag lines per 1000 (default %(default)s)")
+    parser.add_argument("--buffering", dest='bufferingRate', default=0.5, type=float,
+                        help="audio buffering lines per 1000 (default %(default)s)")
+    parser.add_argument("--seed", dest='seed', default=0, type=int, help="random seed (default %(default)s)")
+    flags = parser.parse_args()
+
+    options = vars(flags)
+    output = options.pop('output')
+    options['size'] = int(options['size'] * 1024 * 1024)
+    size = writeLog(output, **options)
+    print("{}: {:.1f} MB".format(output, size / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Compares a log read into a list of strings with LogLines over a memory map.
+
+For each representation, loading and analysis are timed, then repeated under
+tracemalloc for the peak Python heap use. The mapped file itself is paged in
+by the OS and doesn't count towards the heap.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import loganalyzer  # noqa: E402
+from checks.utils.loglines import LogLines  # noqa: E402
+
+
+def readList(filename):
+    with open(filename, "r") as f:
+        return f.read().split('\n')
+
+
+def measure(load, filename):
+    start = time.perf_counter()
+    lines = load(filename)
+    loaded = time.perf_counter()
+    result = loganalyzer.analyzeLog(lines)
+    analyzed = time.perf_counter()
+    del lines
+
+    tracemalloc.start()
+    loganalyzer.analyzeLog(load(filename))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, loaded - start, analyzed - loaded, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest='file', required=True, help="local log file")
+    flags = parser.parse_args()
+
+    print("{:.1f} MB\n".format(os.path.getsize(flags.file) / 1024 / 1024))
+    print("{:>10} {:>10} {:>12} {:>14}".format("", "load (s)", "analyze (s)", "peak heap (MB)"))
+    expected = None
+    for name, load in (("list", readList), ("LogLines", LogLines.fromFile)):
+        result, loadTime, analyzeTime, peak = measure(load, flags.file)
+        if expected is None:
+            expected = result
+        assert result == expected, "results differ with {}".format(name)
+        print("{:>10} {:>10.3f} {:>12.3f} {:>14.1f}".format(name, loadTime, analyzeTime, peak / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Times analysis of a log with 1, 2, 4 and 8 worker processes.
+
+The pool of each worker count is started and warmed up before timing, as it
+would be in a long running server. The log given with --file is grown by
+repeating everything after its header section (see scanner.py).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import loganalyzer  # noqa: E402
+from checks import parallel  # noqa: E402
+from checks.utils.fetchers import getLinesLocal  # noqa: E402
+from scanner import scaleLog, timeIt  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest='file', required=True, help="local log file to scale up")
+    parser.add_argument("--factor", dest='factor', default=1, type=int, help="how many times to repeat the log body")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=3, type=int, help="runs per measurement, best is kept")
+    flags = parser.parse_args()
+
+    lines = scaleLog(getLinesLocal(flags.file), flags.factor)
+    size = sum(map(len, lines))
+    print("{} lines, {:.1f} MB, {} CPUs\n".format(len(lines), size / 1024 / 1024, os.cpu_count()))
+
+    parallel.parallelThreshold = 0
+    expected = None
+    print("{:>8} {:>10} {:>9}".format("workers", "time (s)", "speedup"))
+    for workers in (1, 2, 4, 8):
+        parallel.parallelWorkers = workers
+        result = loganalyzer.analyzeLog(lines)
+        if expected is None:
+            expected = result
+            base = timeIt(lambda: loganalyzer.analyzeLog(lines), flags.repeat)
+            elapsed = base
+        else:
+            assert result == expected, "results differ with {} workers".format(workers)
+            elapsed = timeIt(lambda: loganalyzer.analyzeLog(lines), flags.repeat)
+        print("{:>8} {:>10.3f} {:>8.2f}x".format(workers, elapsed, base / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Compares deriving the log structure per check against one shared ParsedLog.
+
+Before ParsedLog, each check located and re-read the structure it needed: the
+operating system from the header (once for selecting the checks, again in the
+plugin list check), the module list, the last video settings reset (twice,
+for the video and the stream settings checks), the scene ranges and the
+capture sources in each of them. The legacy functions below do what those
+checks did. Both sides use the same term index, so only the lines read after
+locating the structure are counted. ParsedLog reads each block once, and
+locates scenes and the capture sources in them through the index alone.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import loganalyzer  # noqa: E402
+from checks.utils.fetchers import getLinesLocal  # noqa: E402
+from checks.utils.parsedlog import parseLog  # noqa: E402
+from checks.utils.utils import *  # noqa: E402
+from genlog import generateLog  # noqa: E402
+from scanner import timeIt  # noqa: E402
+
+# Searched by the scene checks before ParsedLog
+registerTerms('monitor_capture', 'game_capture')
+
+
+# The derivations of the checks before ParsedLog, for comparison
+def legacyOperatingSystem(lines):
+    subSections = getSubSections(lines)
+    if not subSections:
+        return
+    for s in lines[:subSections[0]]:
+        if 'mac' in s:
+            return "mac"
+        elif 'windows' in s:
+            return "windows"
+        elif 'linux' in s:
+            return "linux"
+
+
+def legacyModules(lines):
+    moduleStart = getLoadedModules(lines)[0]
+    return [s.split(': ', 1)[1].rsplit('.', 1)[0].strip() for s in lines[(moduleStart + 1):getPluginEnd(lines)] if '     ' in s]
+
+
+def legacyVideoSettings(lines, end=None):
+    line = searchWithIndex("video settings reset:", lines, end=end)[-1][1]
+    return [lines[line + i].split()[-1] for i in (1, 2, 4, 5, 6)]
+
+
+def legacyScenes(lines):
+    sceneLines = getScenes(lines)
+    sections = getSections(lines)
+    ranges = [(s, getNextPos(s, sceneLines) if s != sceneLines[-1] else getNextPos(s, sections)) for s in sceneLines]
+    return [(search('monitor_capture', lines, lower, higher), search('game_capture', lines, lower, higher))
+            for lower, higher in ranges]
+
+
+def legacy(lines):
+    legacyOperatingSystem(lines)  # selectChecks
+    legacyOperatingSystem(lines)  # checkPluginList
+    legacyModules(lines)
+    legacyVideoSettings(lines)
+    legacyVideoSettings(lines, searchIndices("stream'] settings:", lines)[-1] + 1)
+    legacyScenes(lines)
+
+
+def parsed(lines):
+    parsed = parseLog(lines)
+    parsed.operatingSystem
+    parsed.operatingSystem
+    parsed.modules
+    parsed.lastVideoReset()
+    parsed.lastVideoReset(searchIndices("stream'] settings:", lines)[-1] + 1)
+    [(parsed.sources(scene, 'monitor_capture'), parsed.sources(scene, 'game_capture')) for scene in parsed.scenes]
+
+
+def countReads(func, lines):
+    count = 0
+    read = LogLines._line
+
+    def countingRead(self, i):
+        nonlocal count
+        count += 1
+        return read(self, i)
+
+    LogLines._line = countingRead
+    try:
+        func(lines)
+    finally:
+        LogLines._line = read
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest='file', default=None, help="local log file (default: generated logs)")
+    parser.add_argument("--scenes", dest='scenes', default="4,16,64", help="comma separated scene counts of the generated logs")
+    parser.add_argument("--iterations", "-n", dest='iterations', default=200, type=int, help="derivations per measurement")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=5, type=int, help="runs per measurement, best is kept")
+    flags = parser.parse_args()
+    loganalyzer.loadChecks()  # registers the terms of every check
+
+    if flags.file:
+        logs = [(os.path.basename(flags.file), getLinesLocal(flags.file))]
+    else:
+        logs = [("{} scenes".format(n), list(generateLog(size=1024 * 1024, scenes=n))) for n in map(int, flags.scenes.split(','))]
+
+    print("{:>12} {:>9} {:>14} {:>14} {:>12} {:>12}".format(
+        "log", "lines", "legacy reads", "parsed reads", "legacy (us)", "parsed (us)"))
+    for name, lines in logs:
+        indexed = indexLines(LogLines.fromLines(list(lines)))
+
+        def fresh():
+            # Same index, no ParsedLog cached yet
+            view = LogLines(indexed.buffer, indexed.offsets)
+            view.termIndex = indexed.termIndex
+            return view
+
+        legacyReads = countReads(legacy, fresh())
+        parsedReads = countReads(parsed, fresh())
+        before = timeIt(lambda: [legacy(fresh()) for _ in range(flags.iterations)], flags.repeat)
+        after = timeIt(lambda: [parsed(fresh()) for _ in range(flags.iterations)], flags.repeat)
+        print("{:>12} {:>9} {:>14} {:>14} {:>12.1f} {:>12.1f}".format(
+            name, len(indexed), legacyReads, parsedReads,
+            before / flags.iterations * 1e6, after / flags.iterations * 1e6))
+
+
+if __name__ == "__main__":
+    main()
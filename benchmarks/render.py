@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Times rendering of the HTML report against the previous concatenating renderer.
+
+The report is built from synthetic messages of all levels, each with a help
+text of about the length the checks produce. Both renderers must produce the
+same page.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # the templates are read relative to the working directory
+
+import simplehttp  # noqa: E402
+from simplehttp import htmlDetail, htmlTemplate  # noqa: E402
+from scanner import timeIt  # noqa: E402
+
+URL = "https://obsproject.com/logs/ABCDEFGHIJKLMNOP"
+HELP = ("Your encoder is overloaded. <a href=\"https://obsproject.com/kb/encoding-performance-troubleshooting\">"
+        "Read the guide</a> for <strong>ways to lower the load</strong>, like a faster preset. ") * 4
+
+
+def makeMessages(count):
+    messages = [[0, "DESCRIPTION", "21:00:00.000: CPU Name: AMD Ryzen 7 5800X 8-Core Processor"]]
+    for n in range(count):
+        messages.append([(n % 3) + 1, "Check {}".format(n), HELP])
+    return messages
+
+
+# The renderer before compiled templates, for comparison
+def legacySummaryHTML(messages):
+    critical = ""
+    warning = ""
+    info = ""
+    for i in messages:
+        if (i[0] == 3):
+            critical = critical + """<p><a href="#""" + \
+                i[1] + """"><button type="button" class="btn btn-danger">""" + \
+                i[1] + "</button></a></p>\n"
+        elif (i[0] == 2):
+            warning = warning + """<p><a href="#""" + \
+                i[1] + """"><button type="button" class="btn btn-warning">""" + \
+                i[1] + "</button></a></p>\n"
+        elif (i[0] == 1):
+            info = info + """<p><a href="#""" + \
+                i[1] + """"><button type="button" class="btn btn-info">""" + \
+                i[1] + "</button></a></p>\n"
+    if (len(critical) == 0):
+        critical = "No critical issues."
+    if (len(warning) == 0):
+        warning = "No warnings."
+    if (len(info) == 0):
+        info = "-"
+    return critical, warning, info
+
+
+def legacyDetailsHTML(messages):
+    res = ""
+    for level, sev, severity in ((3, 'danger', 'Critical'), (2, 'warning', 'Warning'), (1, 'info', 'Info')):
+        for i in messages:
+            if (i[0] == level):
+                res = res + htmlDetail.format(anchor=i[1], sev=sev, severity=severity, title=i[1], text=i[2])
+    return res
+
+
+def legacyFullHtmlResponse(url, msgs):
+    crit, warn, info = legacySummaryHTML(msgs)
+    descr = ""
+    for i in msgs:
+        if (i[0] == 0):
+            descr = i[2]
+    return htmlTemplate.format(ph=url, description="""<a href="{}">{}</a>""".format(url, descr),
+                               summary_critical=crit, summary_warning=warn, summary_info=info,
+                               timeline="", details=legacyDetailsHTML(msgs))
+
+
+def legacyEmptyHtmlResponse():
+    simplehttp.genEmptyHtmlResponse.cache_clear()
+    return simplehttp.genEmptyHtmlResponse()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", "-m", dest='messages', default="10,50,200,1000", help="comma separated message counts")
+    parser.add_argument("--iterations", "-n", dest='iterations', default=200, type=int, help="renders per measurement")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=5, type=int, help="runs per measurement, best is kept")
+    flags = parser.parse_args()
+
+    print("{:>10} {:>10} {:>14} {:>14} {:>9}".format("messages", "page (KB)", "legacy (ms)", "compiled (ms)", "speedup"))
+    for count in map(int, flags.messages.split(',')):
+        msgs = makeMessages(count)
+        page = simplehttp.genFullHtmlResponse(URL, msgs)
+        assert page == legacyFullHtmlResponse(URL, msgs), "pages differ"
+        before = timeIt(lambda: [legacyFullHtmlResponse(URL, msgs) for _ in range(flags.iterations)], flags.repeat)
+        after = timeIt(lambda: [simplehttp.genFullHtmlResponse(URL, msgs) for _ in range(flags.iterations)], flags.repeat)
+        print("{:>10} {:>10.1f} {:>14.3f} {:>14.3f} {:>8.1f}x".format(
+            count, len(page) / 1024, before / flags.iterations * 1000, after / flags.iterations * 1000, before / after))
+
+    before = timeIt(lambda: [legacyEmptyHtmlResponse() for _ in range(flags.iterations)], flags.repeat)
+    after = timeIt(lambda: [simplehttp.genEmptyHtmlResponse() for _ in range(flags.iterations)], flags.repeat)
+    print("{:>10} {:>10.1f} {:>14.3f} {:>14.3f} {:>8.1f}x".format(
+        "empty", len(simplehttp.genEmptyHtmlResponse()) / 1024,
+        before / flags.iterations * 1000, after / flags.iterations * 1000, before / after))
+
+
+if __name__ == "__main__":
+    main()
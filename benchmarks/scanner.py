@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Compares the single-pass term index against one search() sweep per term.
+
+The log given with --file is grown by repeating everything after its header
+section, and the number of terms is grown by adding synthetic terms that never
+match. Independent sweeps scale with size x terms, the index with size only.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import loganalyzer  # noqa: E402
+from checks.utils.fetchers import getLinesLocal  # noqa: E402
+from checks.utils.utils import *  # noqa: E402
+
+
+def scaleLog(lines, factor):
+    lines = list(lines)
+    sections = getSections(lines)
+    if not sections:
+        return LogLines.fromLines(lines * factor)
+    return LogLines.fromLines(lines[:sections[0]] + lines[sections[0]:] * factor)
+
+
+def timeIt(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest='file', required=True, help="local log file to scale up")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=3, type=int, help="runs per measurement, best is kept")
+    flags = parser.parse_args()
+    loganalyzer.loadChecks()  # registers the terms of every check
+
+    baseLines = getLinesLocal(flags.file)
+    terms = sorted(searchTerms)
+
+    print("{:>8} {:>10} {:>6} {:>12} {:>12}".format("factor", "lines", "terms", "sweeps (s)", "index (s)"))
+    for factor in (1, 2, 4, 8):
+        lines = scaleLog(baseLines, factor)
+        textLines = list(lines)
+        for extra in (0, len(terms)):
+            allTerms = terms + ["no such term {}".format(i) for i in range(extra)]
+
+            def sweeps():
+                for term in allTerms:
+                    [s for s in textLines if term in s]
+
+            def index():
+                TermIndex(lines, allTerms)
+
+            print("{:>8} {:>10} {:>6} {:>12.3f} {:>12.3f}".format(
+                factor, len(lines), len(allTerms), timeIt(sweeps, flags.repeat), timeIt(index, flags.repeat)))
+
+    print("\ndoAnalysis: {:.3f}s".format(timeIt(lambda: loganalyzer.doAnalysis(filename=flags.file), flags.repeat)))
+
+
+if __name__ == "__main__":
+    main()
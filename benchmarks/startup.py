@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Measures cold start: importing the analyzer and short CLI runs, each in a fresh interpreter.
+
+Every run is `python -X importtime`, so besides the wall time it reports the
+import time the interpreter logged, and the check modules loaded by the end of
+the run (read from sys.modules: imports through importlib aren't logged). The
+CLI runs analyze small generated logs of each platform; check modules are
+loaded for the platform of the log, so each run only imports its own. The
+worker row is what a process pool worker imports to run checks. --top lists
+the slowest imports of the analyzer module.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Appended to the code of every run, reports the loaded check modules
+REPORT = "; import sys; print('loaded:', *sorted(m[7:] for m in sys.modules if m.count('.') == 1 and m.startswith('checks.')), file=sys.stderr)"
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from genlog import writeLog  # noqa: E402
+
+
+def importTimes(log):
+    """Parses an -X importtime log. Returns module: (own, cumulative, depth), times
+    in microseconds, and the check modules of the REPORT line."""
+    times = {}
+    loaded = []
+    for line in log.splitlines():
+        if line.startswith('loaded:'):
+            loaded = line.split()[1:]
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|', 2)
+        try:
+            times[name.strip()] = (int(own), int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2)
+        except ValueError:
+            continue  # the header line
+    return times, loaded
+
+
+def run(code, repeat):
+    """Runs python -X importtime -c code in fresh processes. Returns the best wall
+    time in seconds, and the import times and loaded check modules of that run."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code + REPORT], cwd=ROOT,
+                              capture_output=True, text=True, check=True)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed,) + importTimes(proc.stderr)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--os", dest='os', default="windows,mac,linux", help="comma separated OSes of the CLI runs (default %(default)s)")
+    parser.add_argument("--size", dest='size', default=0.1, type=float, help="size of the generated logs in MB (default %(default)s)")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=5, type=int, help="runs per measurement, best is kept (default %(default)s)")
+    parser.add_argument("--top", dest='top', default=10, type=int, help="slowest imports of the analyzer to list (default %(default)s)")
+    flags = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [("interpreter", "pass"),
+                ("import loganalyzer", "import loganalyzer"),
+                ("worker", "import checks.parallel")]
+        for osName in flags.os.split(','):
+            path = os.path.join(workdir, osName + '.log')
+            writeLog(path, size=int(flags.size * 1024 * 1024), os=osName)
+            # What running loganalyzer.py --file does, in the same process as REPORT
+            runs.append(("cli " + osName, "import sys, loganalyzer; sys.argv = ['loganalyzer.py', '--file', {!r}]; "
+                                          "loganalyzer.main()".format(path)))
+
+        print("{:>20} {:>10} {:>12}  {}".format("run", "wall (ms)", "import (ms)", "check modules"))
+        analyzer = None
+        for name, code in runs:
+            elapsed, times, loaded = run(code, flags.repeat)
+            imported = sum(cumulative for own, cumulative, depth in times.values() if depth == 0)
+            print("{:>20} {:>10.1f} {:>12.1f}  {}".format(name, elapsed * 1000, imported / 1000, ", ".join(loaded) or "-"))
+            if code == "import loganalyzer":
+                analyzer = times
+
+    print("\nslowest imports of loganalyzer (cumulative ms):")
+    for module, (own, cumulative, depth) in sorted(analyzer.items(), key=lambda t: -t[1][1])[:flags.top]:
+        print("{:>10.1f} {}{}".format(cumulative / 1000, '  ' * depth, module))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Compares end-to-end latency of buffered and streaming log ingest.
+
+A local server sends the log at a fixed rate. The buffered path downloads the
+whole log, then splits, indexes and analyzes it; the streaming path splits
+and indexes chunks while they arrive, then analyzes. "tail" is the time left
+after a plain download of the same log would have finished.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import loganalyzer  # noqa: E402
+from checks.utils import asyncfetchers  # noqa: E402
+from checks.utils.fetchers import getLinesLocal  # noqa: E402
+from checks.utils.loglines import LogLines  # noqa: E402
+from scanner import scaleLog  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+def serve(data, rate, port, ready):
+    async def handler(request):
+        resp = web.StreamResponse(headers={'Content-Type': 'text/plain'})
+        resp.content_length = len(data)
+        await resp.prepare(request)
+        start = time.perf_counter()
+        for pos in range(0, len(data), CHUNK):
+            if rate:
+                # Pace the chunks to the target rate
+                await asyncio.sleep(max(start + pos / rate - time.perf_counter(), 0))
+            await resp.write(data[pos:pos + CHUNK])
+        await resp.write_eof()
+        return resp
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+async def download(session, url):
+    start = time.perf_counter()
+    await asyncfetchers.fetch(session, url)
+    return time.perf_counter() - start
+
+
+async def buffered(session, url):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    _, text = await asyncfetchers.fetchText(session, url)
+    result = await loop.run_in_executor(None, lambda: loganalyzer.analyzeLog(LogLines.fromText(text)))
+    return time.perf_counter() - start, result
+
+
+async def streaming(session, url):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    _, builder = await asyncfetchers.fetchStream(session, url)
+    result = await loop.run_in_executor(None, lambda: loganalyzer.analyzeLog(builder.finish()))
+    return time.perf_counter() - start, result
+
+
+async def measure(url, repeat):
+    session = asyncfetchers.createSession()
+    try:
+        best = {}
+        for _ in range(repeat):
+            for name, run in (("download", download), ("buffered", buffered), ("streaming", streaming)):
+                elapsed = await run(session, url)
+                if name != "download":
+                    elapsed, result = elapsed
+                    best.setdefault(name + " result", result)
+                    assert result == best["buffered result"], "streaming results differ"
+                best[name] = min(best.get(name, elapsed), elapsed)
+        return best
+    finally:
+        await session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest='file', required=True, help="local log file to serve")
+    parser.add_argument("--factor", dest='factor', default=1, type=int, help="how many times to repeat the log body")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=3, type=int, help="runs per measurement, best is kept")
+    parser.add_argument("--rates", dest='rates', default="2,8,32,0", help="comma separated send rates in MB/s, 0 is unthrottled")
+    flags = parser.parse_args()
+    loganalyzer.loadChecks()  # like the web server, the download is indexed before the platform is known
+
+    data = scaleLog(getLinesLocal(flags.file), flags.factor).toBytes()
+    print("{:.1f} MB\n".format(len(data) / 1024 / 1024))
+    print("{:>10} {:>13} {:>13} {:>13} {:>13} {:>13}".format(
+        "MB/s", "download (s)", "buffered (s)", "tail (s)", "streaming (s)", "tail (s)"))
+    for port, rate in enumerate(flags.rates.split(','), 8780):
+        rate = float(rate)
+        ready = threading.Event()
+        threading.Thread(target=serve, args=(data, rate * 1024 * 1024, port, ready), daemon=True).start()
+        ready.wait()
+        best = asyncio.run(measure('http://127.0.0.1:{}/'.format(port), flags.repeat))
+        print("{:>10} {:>13.3f} {:>13.3f} {:>13.3f} {:>13.3f} {:>13.3f}".format(
+            rate or "max", best["download"], best["buffered"], best["buffered"] - best["download"],
+            best["streaming"], best["streaming"] - best["download"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmarks analysis, rendering and memory use on generated logs of growing size.
+
+Logs are written by genlog.py into --workdir, once per set of options, and
+reused by later runs. Each log is measured in a fresh process: reading it,
+analyzing it (best of --repeat, without network access), rendering the HTML
+and JSON reports, and the peak resident memory of the process. One JSON
+record per log is appended to --output, tagged with the commit and machine,
+so runs can be compared over time.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None  # not on Windows, peak memory isn't reported
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from genlog import writeLog  # noqa: E402
+
+
+def peakRss():
+    """Peak resident memory of this process in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def best(func, repeat):
+    fastest = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return fastest, result
+
+
+def measureLog(path, repeat):
+    """Runs in a fresh process. Returns the measurements for one log."""
+    os.chdir(ROOT)  # the templates are read relative to the working directory
+    import loganalyzer
+    import simplehttp
+    from checks.utils.loglines import LogLines
+
+    baseline = peakRss()
+    read, logLines = best(lambda: LogLines.fromFile(path), repeat)
+    # A fresh view each run, so no run reuses the term index of the previous one
+    analysis, messages = best(lambda: loganalyzer.analyzeLog(
+        LogLines(logLines.buffer, logLines.offsets, logLines.start, logLines.stop)), repeat)
+    messages = [loganalyzer.getDescription(logLines)] + [m for m in messages if m is not None]
+    renderHtml, page = best(lambda: simplehttp.genFullHtmlResponse(path, messages), repeat)
+    renderJson, _ = best(lambda: json.dumps(simplehttp.genJsonResponse(messages, True)), repeat)
+    peak = peakRss()
+    return {'lines': len(logLines), 'messages': len(messages) - 1, 'read': read, 'analysis': analysis,
+            'renderHtml': renderHtml, 'renderJson': renderJson, 'pageBytes': len(page.encode('utf-8')),
+            'peakRss': peak, 'baselineRss': baseline}
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", dest='sizes', default="0.1,1,10,100,500", help="comma separated log sizes in MB (default %(default)s)")
+    parser.add_argument("--os", dest='os', default="windows", help="comma separated header OSes: windows, mac, linux (default %(default)s)")
+    parser.add_argument("--sessions", dest='sessions', default=2, type=int, help="streaming sessions per log (default %(default)s)")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=3, type=int, help="runs per measurement, best is kept (default %(default)s)")
+    parser.add_argument("--workdir", dest='workdir', default=os.path.join(tempfile.gettempdir(), 'loganalyzer-bench'),
+                        help="where generated logs are kept (default %(default)s)")
+    parser.add_argument("--output", "-o", dest='output', default="benchmark-results.jsonl",
+                        help="JSONL file the results are appended to (default %(default)s)")
+    parser.add_argument("--label", dest='label', default=None, help="free text stored with the results")
+    flags = parser.parse_args()
+
+    os.makedirs(flags.workdir, exist_ok=True)
+    run = {'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'), 'commit': commit(),
+           'label': flags.label, 'python': platform.python_version(), 'machine': platform.platform(),
+           'cpus': os.cpu_count(), 'repeat': flags.repeat}
+    # Measurements in a clean process each, so peak memory isn't carried over
+    context = multiprocessing.get_context('spawn')
+
+    print("{:>8} {:>9} {:>10} {:>9} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+        "os", "size (MB)", "lines", "read (s)", "analysis (s)", "MB/s", "html (ms)", "json (ms)", "peak (MB)"))
+    with open(flags.output, "a") as out:
+        for osName in flags.os.split(','):
+            for size in flags.sizes.split(','):
+                options = {'size': int(float(size) * 1024 * 1024), 'os': osName, 'sessions': flags.sessions}
+                path = os.path.join(flags.workdir, "{os}-{size}-{sessions}.log".format(**options))
+                if not os.path.exists(path):
+                    writeLog(path + '.tmp', **options)
+                    os.replace(path + '.tmp', path)
+                with context.Pool(1) as pool:
+                    result = pool.apply(measureLog, (path, flags.repeat))
+                record = dict(run, os=osName, bytes=os.path.getsize(path), sessions=flags.sessions, **result)
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                mb = record['bytes'] / 1024 / 1024
+                print("{:>8} {:>9.1f} {:>10} {:>9.3f} {:>12.3f} {:>10.1f} {:>10.2f} {:>10.2f} {:>10}".format(
+                    osName, mb, record['lines'], record['read'], record['analysis'], mb / record['analysis'],
+                    record['renderHtml'] * 1000, record['renderJson'] * 1000,
+                    '-' if record['peakRss'] is None else '{:.0f}'.format(record['peakRss'] / 1024 / 1024)))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,13 @@ from .vars import *
 from .utils.utils import *
 
 
-audiobuf_re = re.compile(r"""
+registerTerms(
+    'audio_monitor_init_wasapi: Failed',
+    'Max audio buffering reached!',
+    'total audio buffering is now')
+
+
+audiobuf_re = LazyPattern(r"""
     (?i)
     adding \s (?P<added> \d+) \s milliseconds \s of \s audio \s buffering
     , \s
@@ -4,6 +4,19 @@ import re
 from .vars import *
 from .utils.utils import *
 from .utils import obsversion
+from .utils.parsedlog import parseLog
+
+
+registerTerms(
+    ': Open Broadcaster Software v0.',
+    'Unhandled exception:',
+    'Warning: OBS is already running!',
+    'Auto-config wizard',
+    'CPU Name',
+    'OBS',
+    'Portable mode: true',
+    'Safe Mode enabled.',
+    'not on safe list')
 
 
 def checkClassic(lines):
@@ -106,14 +119,7 @@ def checkObsVersion(lines):
 
 
 def checkOperatingSystem(lines):
-    firstSection = lines[:getSubSections(lines)[0]]
-    for s in firstSection:
-        if 'mac' in s:
-            return "mac"
-        elif 'windows' in s:
-            return "windows"
-        elif 'linux' in s:
-            return "linux"
+    return parseLog(lines).operatingSystem
 
 
 def checkPortableMode(lines):
@@ -1,20 +1,61 @@
 from .vars import *
 from .utils.utils import *
-import re
+from .utils.parsedlog import downsample, parseLog
 
 
-params_re = re.compile(r"\t(?P<key>\w+):\s*(?P<value>\S+)")
+registerTerms(
+    'Writing file ',
+    'movflags=frag_keyframe+empty_moov+delay_moov',
+    'x264 encoder:',
+    'preset: ',
+    "'adv_ffmpeg_output':",
+    "stream'] settings:",
+    'Failed to open NVENC codec',
+    'Error encoding with encoder',
+    '[x264 encoder:',
+    '[AV1 encoder:',
+    '[obs-nvenc:',
+    '[texture-amf-',
+    '[qsv encoder:',
+    '[VideoToolbox ',
+    'Encoder ID')
+
+
+params_re = LazyPattern(r"\t(?P<key>\w+):\s*(?P<value>\S+)")
 
 
 def checkAttempt(lines):
-    recordingStarts = search('== Recording Start ==', lines)
-    streamingStarts = search('== Streaming Start ==', lines)
-    replaybufferStarts = search('== Replay Buffer Start ==', lines)
-    if (len(recordingStarts) + len(streamingStarts) + len(replaybufferStarts) == 0):
+    if not parseLog(lines).sessions:
         return [LEVEL_INFO, "No Output Session",
                 "Your log contains no recording or streaming session. Results of this log analysis are limited. Please post a link to a clean log file. " + cleanLog]
 
 
+def getOutputSessions(lines):
+    """Per-session results for the JSON output, as a LEVEL_NONE message. Line numbers start at 1."""
+    sessions = []
+    for session in parseLog(lines).sessions:
+        sessions.append({"type": session.kind,
+                         "lines": [session.start + 1, session.end],
+                         "stopped": session.stop is not None,
+                         "videoSettings": session.videoSettings,
+                         "encoders": [{"encoder": e.encoder, "name": e.name, "settings": e.settings} for e in session.encoders],
+                         "duration": session.duration,
+                         "stats": {stat: s._asdict() for stat, s in session.stats.items() if s.count},
+                         "dropped": session.dropped,
+                         "lagged": session.lagged,
+                         "skipped": session.skipped})
+    if sessions:
+        return [LEVEL_NONE, SESSIONS_TITLE, sessions]
+
+
+def getTimeline(lines, points=120):
+    """The statistics lines over time, at most points [seconds, value] pairs per
+    statistic, as a LEVEL_NONE message. Seconds count from the first timestamp."""
+    timeline = {stat: downsample(series, points) for stat, series in parseLog(lines).timeline.items() if series.lines}
+    if timeline:
+        return [LEVEL_NONE, TIMELINE_TITLE, timeline]
+
+
 def checkMP4(lines):
     writtenFiles = search('Writing file ', lines)
     mp4 = search('.mp4', writtenFiles)
@@ -74,12 +115,15 @@ def checkStreamSettings(lines):
             return
 
         # If fps or resolution aren't listed in encode parameters or aren't a number, fetch them from the video settings
-        line = searchWithIndex("video settings reset:", lines[:line])[-1][1]
+        videoSettings = parseLog(lines).lastVideoReset(end=line)
+        if videoSettings is None:
+            return
+        settings = videoSettings.settings
         try:
             if encode_params["height"] is None or encode_params["width"] is None:
-                encode_params["width"], encode_params["height"] = (int(_) for _ in (lines[line + 2].split()[-1]).split("x"))
+                encode_params["width"], encode_params["height"] = (int(_) for _ in settings.get('output resolution', '').split("x"))
             if encode_params["fps_den"] is None or encode_params["fps_num"] is None:
-                encode_params["fps_num"], encode_params["fps_den"] = (int(_) for _ in (lines[line + 4].split()[-1]).split("/"))
+                encode_params["fps_num"], encode_params["fps_den"] = (int(_) for _ in settings.get('fps', '').split("/"))
         except (ValueError, OverflowError):
             return                             # If fetching them from the video settings fails, don't perform the check
 
@@ -109,17 +153,8 @@ def checkEncoding(lines):
                    or search('[texture-amf-', lines)
                    or search('[qsv encoder:', lines)
                    or searchExclude('[VideoToolbox ', lines, ["[VideoToolbox encoder]: "]))
-    drops = search('skipped frames', lines)
-    val = 0
+    val = parseLog(lines).highest('skipped')
     severity = 9000
-    for drop in drops:
-        try:
-            v = float(drop[drop.find("(") + 1: drop.find(")")
-                           ].strip('%').replace(",", "."))
-        except (ValueError, OverflowError):
-            v = 0
-        if (v > val):
-            val = v
     if (val != 0):
         if (val >= 15):
             severity = LEVEL_CRITICAL
@@ -141,7 +176,7 @@ def checkEncoding(lines):
                     """Encoder overload may be related to your CPU or GPU being overloaded, depending on the encoder in question. If you are using a software encoder (x264) please see the <a href="https://obsproject.com/kb/encoding-performance-troubleshooting">CPU Overload Guide</a>. If you are using a hardware encoder (AMF, QSV/Quicksync, NVENC) please see the <a href="https://obsproject.com/kb/encoding-performance-troubleshooting">GPU Overload Guide</a>."""]
 
 
-unknownenc_re = re.compile(r"Encoder\sID\s'(?P<name>.+)'\snot\sfound")
+unknownenc_re = LazyPattern(r"Encoder\sID\s'(?P<name>.+)'\snot\sfound")
 
 
 def checkUnknownEncoder(lines):
@@ -1,8 +1,21 @@
 from .vars import *
 from .utils.utils import *
+from .utils.parsedlog import parseLog
 from .linux import checkFlatpak
 
 
+registerTerms(
+    'Failed to initialize video',
+    'The AMF Runtime is very old and unsupported',
+    '[obs-nvenc] Current driver version does not support this NVENC version, please upgrade your driver',
+    '[NVENC] Test process failed: outdated_driver',
+    'Using EGL/X11',
+    'OpenGL loaded successfully, version 3.3.0 NVIDIA 390',
+    'OpenGL on adapter Mesa llvmpipe',
+    'NVIDIA GeForce 940',
+    'NVENC encoder')
+
+
 def checkInit(lines):
     if search('Failed to initialize video', lines):
         return [LEVEL_CRITICAL, "Initialize Failed",
@@ -10,19 +23,7 @@ def checkInit(lines):
 
 
 def getRenderLag(lines):
-    drops = search('rendering lag', lines)
-    val = 0
-    severity = 9000
-    for drop in drops:
-        try:
-            v = float(drop[drop.find("(") + 1: drop.find(")")
-                           ].strip('%').replace(",", "."))
-        except (ValueError, OverflowError):
-            v = 0
-        if (v > val):
-            val = v
-
-    return val
+    return parseLog(lines).highest('lagged')
 
 
 def checkRenderLag(lines):
@@ -52,6 +53,14 @@ def checkNVIDIAdrivers(lines):
                 """The installed NVIDIA driver does not support NVENC features needed for optimized encoders. Consider updating your drivers by downloading the newest installer from <a href="https://www.nvidia.com/Download/index.aspx">NVIDIA's website</a>. """]
 
 
+def check940(lines):
+    gpu = search('NVIDIA GeForce 940', lines)
+    attempt = search('NVENC encoder', lines)
+    if (len(gpu) > 0) and (len(attempt) > 0):
+        return [LEVEL_CRITICAL, "NVENC Not Supported",
+                """The NVENC Encoder is not supported on the NVIDIA 940 and 940MX. Recording fails to start because of this. Please select "Software (x264)" or "Hardware (QSV)" as encoder instead in Settings > Output."""]
+
+
 def checkNVIDIAdriversEGL(lines):
     if not search('Using EGL/X11', lines):
         return
@@ -69,14 +78,12 @@ def checkLLVMpipe(lines):
 
 
 def checkVideoSettings(lines):
-    videoSettings = []
+    videoSettings = parseLog(lines).lastVideoReset()
     res = []
-    for i, s in enumerate(lines):
-        if "video settings reset:" in s:
-            videoSettings.append(i)
-    if (len(videoSettings) > 0):
-        fmt = lines[videoSettings[-1] + 5].split()[-1]
-        colorRange = lines[videoSettings[-1] + 6].split()[-1]
+    if videoSettings:
+        settings = videoSettings.settings
+        fmt = settings.get('format', '')
+        colorRange = settings.get('YUV mode', '')
         if 'Full' in colorRange:
             res.append([LEVEL_WARNING, "Wrong Color Range",
                         """Having the Color Range set to "Full" will cause playback issues in certain browsers and on various video platforms. Shadows, highlights and color will look off. In OBS, go to "Settings -> Advanced" and set "Color Range" back to "Limited"."""])
@@ -84,10 +91,10 @@ def checkVideoSettings(lines):
             res.append([LEVEL_CRITICAL, "Wrong Color Format",
                         "Color Formats other than NV12 and P010 are primarily intended for recording, and are not recommended when streaming. Streaming may incur increased CPU usage due to color format conversion. You can change your Color Format in Settings -> Advanced."])
 
-        basex, basey = lines[videoSettings[-1] + 1].split()[-1].split('x')
-        outx, outy = lines[videoSettings[-1] + 2].split()[-1].split('x')
-        fps_num, fps_den = lines[videoSettings[-1] + 4].split()[-1].split('/')
         try:
+            basex, basey = settings.get('base resolution', '').split('x')
+            outx, outy = settings.get('output resolution', '').split('x')
+            fps_num, fps_den = settings.get('fps', '').split('/')
             baseAspect = float(basex) / float(basey)
             outAspect = float(outx) / float(outy)
             fps = float(fps_num) / float(fps_den)
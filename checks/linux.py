@@ -2,6 +2,22 @@ from .vars import *
 from .utils.utils import *
 
 
+registerTerms(
+    'Session Type:',
+    'Window System:',
+    'Distribution:',
+    'Flatpak Runtime:',
+    '[pipewire]',
+    'pipewire-desktop-capture-source',
+    'pipewire-window-capture-source',
+    'pipewire-screen-capture-source',
+    'Desktop Environment:',
+    'obs-browser.so',
+    'obs-websocket.so',
+    'vlc-video.so',
+    'v4l2loopback not installed')
+
+
 def getSessionTypeLine(lines):
     sessionType = search('Session Type:', lines)
     if len(sessionType) > 0:
@@ -5,6 +5,14 @@ from .utils.utils import *
 from .utils.macosversions import *
 
 
+registerTerms(
+    'OS Name: Mac OS X',
+    'OS Name: macOS',
+    'OS Version:',
+    'Rosetta translation used: true',
+    '[macOS] Permission for')
+
+
 def getMacVersionLine(lines):
     isMac = search('OS Name: Mac OS X', lines) + search('OS Name: macOS', lines)
     macVersion = search('OS Version:', lines)
@@ -73,7 +81,7 @@ def checkRosettaTranslationStatus(lines):
 
 def checkMacPermissions(lines):
     macPerms = search('[macOS] Permission for', lines)
-    deniedPermissions = set()
+    deniedPermissions = {}
 
     for line in macPerms:
         if 'denied' in line:
@@ -88,7 +96,7 @@ def checkMacPermissions(lines):
                 }.get(permissionName)
 
                 if permissionDescription:
-                    deniedPermissions.add(permissionDescription)
+                    deniedPermissions[permissionDescription] = True
 
     if deniedPermissions:
         deniedPermissionsString = "<br>\n<ul>\n<li>" + "</li>\n<li>".join(deniedPermissions) + "</li>\n</ul>"
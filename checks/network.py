@@ -2,20 +2,28 @@ import re
 
 from .vars import *
 from .utils.utils import *
+from .utils.parsedlog import parseLog
+
+
+registerTerms(
+    'Interface: Killer',
+    'Lenovo Vantage / Legion Edge is installed.',
+    '802.11',
+    'Binding to ',
+    'Interface: ',
+    'Dynamic bitrate enabled',
+    'New socket loop enabled by user',
+    'Low latency mode enabled by user',
+    'second delay active',
+    'User is ignoring service bitrate limits.',
+    'channel_layout',
+    'Go live URL:',
+    'bitrate:')
 
 
 def checkDrop(lines):
-    drops = searchExclude('insufficient bandwidth', lines, ['test_stream'])
-    val = 0
+    val = parseLog(lines).highest('dropped')
     severity = 9000
-    for drop in drops:
-        try:
-            v = float(drop[drop.find("(") + 1: drop.find(")")
-                           ].strip('%').replace(",", "."))
-        except (ValueError, OverflowError):
-            v = 0
-        if (v > val):
-            val = v
     if (val != 0):
         if (val >= 15):
             severity = LEVEL_CRITICAL
@@ -51,7 +59,7 @@ def checkBind(lines):
                 """Binding to a manually chosen IP address is rarely needed. Go to Settings -> Advanced -> Network and set "Bind to IP" back to "Default"."""]
 
 
-nicspeed_re = re.compile(r"(?i)Interface: (?P<nicname>.+) \(ethernet, ((?P<speed>\d+)|((?P<downspeed>\d+)↓/(?P<upspeed>\d+)↑)) mbps\)")
+nicspeed_re = LazyPattern(r"(?i)Interface: (?P<nicname>.+) \(ethernet, ((?P<speed>\d+)|((?P<downspeed>\d+)↓/(?P<upspeed>\d+)↑)) mbps\)")
 
 
 def checkNICSpeed(lines):
@@ -112,15 +120,15 @@ def checkServiceRecommendations(lines):
             maxBitrate = int(maxBitrateRE.group(1)) if maxBitrateRE else float("nan")
             # Guards against failed regex, nan to fail the comparison if so
 
-            attemptStart = searchWithIndex("channel_layout", lines[index:])
+            attemptStart = searchWithIndex("channel_layout", lines, start=index)
             # This is the audio encoder line, always included after the video encoder
-            isMultitrack = searchWithIndex("Go live URL:", lines[index: index + attemptStart[0][1]]) if attemptStart else True
+            isMultitrack = searchWithIndex("Go live URL:", lines, index, attemptStart[0][1]) if attemptStart else True
             # True to skip this attempt if not attemptStart
 
             if not isMultitrack:
                 # With enhanced broadcasting, the max recommended are irrelevant
 
-                bitrateLines = searchExclude("bitrate:", lines[index: index + attemptStart[0][1]], ["video bitrate", "audio bitrate", "aggregate"])
+                bitrateLines = searchExclude("bitrate:", lines, ["video bitrate", "audio bitrate", "aggregate"], index, attemptStart[0][1])
                 if bitrateLines and "channels" not in bitrateLines[0]:
 
                     currentBitrateRE = re.search(r'bitrate:\s+(\d+)', bitrateLines[0])
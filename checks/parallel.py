@@ -0,0 +1,184 @@
+import array
+import concurrent.futures
+import itertools
+import mmap
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+from .registry import *
+
+
+# Parallel analysis is opt-in: with more than one worker, logs of at least
+# parallelThreshold bytes are analyzed by a process pool. There is no default
+# threshold until benchmarks/parallel.py has been run on multi-core machines.
+parallelWorkers = 1
+parallelThreshold = None
+
+# Workers map the shared memory segments through their files here, for a
+# buffer LogLines can search in place. Where there is no such directory,
+# logs are analyzed sequentially.
+SHM_DIR = '/dev/shm'
+
+_ITEM = array.array('q').itemsize
+
+_executor = None
+_executorWorkers = 0
+
+# Worker process state: mapped shared memory segments by name, and the log
+# read from them by the last _runChecks call
+_mapped = {}
+_sharedLog = {}
+
+
+def getExecutor(workers):
+    global _executor, _executorWorkers
+    if _executor is None or _executorWorkers != workers:
+        if _executor is not None:
+            _executor.shutdown()
+        # Not forked, the web server calls this from its worker threads
+        _executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _executorWorkers = workers
+    return _executor
+
+
+def logSize(lines):
+    if isinstance(lines, LogLines):
+        start, end = lines.byteRange()
+        return end - start
+    return sum(map(len, lines))
+
+
+def useParallel(lines, workers=None):
+    workers = parallelWorkers if workers is None else workers
+    return (workers > 1 and parallelThreshold is not None and os.path.isdir(SHM_DIR)
+            and logSize(lines) >= parallelThreshold)
+
+
+def _map(name, keep=None):
+    # Read-only mmap of a segment. Unlike SharedMemory.buf, a memoryview, it
+    # has the find() LogLines searches with. keep: a segment of the same
+    # analysis that is still in use.
+    if name not in _mapped:
+        # Segments of earlier analyses are gone from the parent by now
+        for other in [other for other in _mapped if other != keep]:
+            _mapped.pop(other).close()
+        with open(os.path.join(SHM_DIR, name), 'rb') as f:
+            _mapped[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _mapped[name]
+
+
+def _readLines(layout, start, end):
+    # Rebuilds lines[start:end] as LogLines over the shared segment itself;
+    # only the line offsets are copied
+    mapped = _map(layout['name'])
+    offsets = array.array('q')
+    offsets.frombytes(mapped[start * _ITEM:(end + 1) * _ITEM])
+    return LogLines(mapped, offsets)
+
+
+def _scanChunk(layout, start, end, terms):
+    return TermIndex(_readLines(layout, start, end), terms).hits
+
+
+def _runChecks(layout, hitsLayout, names):
+    key = (layout['name'], hitsLayout['name'])
+    if key not in _sharedLog:
+        lines = _readLines(layout, 0, layout['lineCount'])
+        allHits = array.array('q')
+        allHits.frombytes(_map(hitsLayout['name'], keep=layout['name'])[:hitsLayout['count'] * _ITEM])
+        hits = {t: allHits[a:a + n].tolist() for t, (a, n) in hitsLayout['terms'].items()}
+        _sharedLog.clear()
+        _sharedLog[key] = indexLines(lines, hits=hits)
+    lines = _sharedLog[key]
+    checks = {check.name: check for check in checkRegistry}
+    # Timed here, recorded by the parent
+    return [timeCheck(checks[name], lines) for name in names]
+
+
+class ParallelAnalysis():
+    """ Shares a log with the worker processes for the duration of an analysis.
+
+    The log buffer and line offsets live in one shared memory segment and the
+    merged term index in a second one, so workers read the log straight from
+    the shared buffers instead of receiving it pickled. The term index is built in line chunks by
+    all workers, then the selected checks are split across them.
+    """
+
+    def __init__(self, lines, workers=None):
+        self.workers = parallelWorkers if workers is None else workers
+        self.executor = getExecutor(self.workers)
+        self.segments = []
+        try:
+            if not isinstance(lines, LogLines):
+                lines = LogLines.fromLines(lines)
+            self.layout = self._shareLines(lines)
+            self.lines = indexLines(lines, hits=self._scan())
+            self.hitsLayout = self._shareHits(self.lines.termIndex.hits)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for shm in self.segments:
+            shm.close()
+            shm.unlink()
+        self.segments = []
+
+    def _segment(self, size):
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.segments.append(shm)
+        return shm
+
+    def _shareLines(self, lines):
+        lineCount = len(lines)
+        step = max(-(-lineCount // self.workers), 1)
+        chunkStarts = list(range(0, lineCount, step)) + [lineCount]
+        byteStart, byteEnd = lines.byteRange()
+        # Offsets are stored relative to the segment, so that workers can use
+        # them on it as they are
+        dataStart = (lineCount + 1) * _ITEM
+        offsets = array.array('q', (o - byteStart + dataStart for o in lines.offsets[lines.start:lines.stop + 1]))
+
+        shm = self._segment(dataStart + byteEnd - byteStart)
+        shm.buf[:dataStart] = offsets.tobytes()
+        shm.buf[dataStart:dataStart + byteEnd - byteStart] = lines.buffer[byteStart:byteEnd]
+        return {'name': shm.name, 'lineCount': lineCount, 'chunkStarts': chunkStarts, 'dataStart': dataStart}
+
+    def _scan(self):
+        terms = frozenset(searchTerms)
+        chunkStarts = self.layout['chunkStarts']
+        futures = [(a, self.executor.submit(_scanChunk, self.layout, a, b, terms))
+                   for a, b in zip(chunkStarts, chunkStarts[1:])]
+        hits = {t: [] for t in terms}
+        for start, future in futures:
+            for t, found in future.result().items():
+                hits[t].extend(i + start for i in found)
+        return hits
+
+    def _shareHits(self, hits):
+        flat = array.array('q', itertools.chain.from_iterable(hits.values()))
+        shm = self._segment(len(flat) * _ITEM)
+        shm.buf[:len(flat) * _ITEM] = flat.tobytes()
+        terms = {}
+        pos = 0
+        for t, found in hits.items():
+            terms[t] = (pos, len(found))
+            pos += len(found)
+        return {'name': shm.name, 'count': len(flat), 'terms': terms}
+
+    def runChecks(self, lines, checks):
+        """Runs the checks across the workers. Results are in the order of `checks`."""
+        groups = [checks[i::self.workers] for i in range(self.workers)]
+        futures = [self.executor.submit(_runChecks, self.layout, self.hitsLayout, [check.name for check in group])
+                   for group in groups if group]
+        timed = [None] * len(checks)
+        for i, future in enumerate(futures):
+            timed[i::self.workers] = future.result()
+        return recordChecks(checks, timed)
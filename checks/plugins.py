@@ -1,12 +1,20 @@
 from .vars import *
 from .utils.utils import *
+from .utils.parsedlog import parseLog
 from .core import *
 import os.path
 
 
+registerTerms(
+    "' not loaded",
+    "' compiled with newer libobs",
+    ", is disabled")
+
+
 def checkImports(lines):
-    notLoaded = search("' not loaded", lines[:getLoadedModules(lines)[0]])
-    notLoaded += search("' compiled with newer libobs", lines[:getLoadedModules(lines)[0]])
+    moduleStart = getLoadedModules(lines)[0]
+    notLoaded = search("' not loaded", lines, end=moduleStart)
+    notLoaded += search("' compiled with newer libobs", lines, end=moduleStart)
     notLoadedPlugins = []
 
     for line in notLoaded:
@@ -22,8 +30,9 @@ def checkImports(lines):
 
 
 def checkPluginList(lines):
-    moduleStart = getLoadedModules(lines)[0]
-    operatingSystem = checkOperatingSystem(lines)
+    parsed = parseLog(lines)
+    moduleStart = parsed.moduleStart
+    operatingSystem = parsed.operatingSystem
     if moduleStart and operatingSystem:
 
         # When adding to those lists, please follow alphabetical order.
@@ -32,23 +41,16 @@ def checkPluginList(lines):
                      "mac": ['coreaudio-encoder', 'mac-avcapture', 'mac-avcapture-legacy', 'mac-capture', 'mac-syphon', 'mac-videotoolbox', 'mac-virtualcam'],
                      "linux": ['linux-alsa', 'linux-capture', 'linux-jack', 'linux-pipewire', 'linux-pulseaudio', 'linux-v4l2', 'obs-libfdk', 'obs-qsv11']
                      }
-        pluginList = lines[(moduleStart + 1):getPluginEnd(lines)]
-        thirdPartyPlugins = []
-
-        for s in pluginList:
-            if '     ' in s:
-                timestamp, plugin = s.split(': ', 1)
-                plugin = plugin.rsplit('.', 1)[0]
-                plugin = plugin.strip()
-                thirdPartyPlugins.append(plugin)
+        thirdPartyPlugins = [plugin.rsplit('.', 1)[0].strip() for plugin in parsed.modules]
 
-        disabledPlugins = search(", is disabled", lines[:moduleStart])
+        disabledPlugins = search(", is disabled", lines, end=moduleStart)
         for line in disabledPlugins:
             thirdPartyPlugins.append(line.split("'")[1] + " (disabled)")
 
-        thirdPartyPlugins = set(thirdPartyPlugins).difference(commonPlugins)
+        # Deduplicated in log order, so the output doesn't depend on set ordering
         if operatingSystem in osPlugins:
-            thirdPartyPlugins = set(thirdPartyPlugins).difference(osPlugins[operatingSystem])
+            thirdPartyPlugins = [plugin for plugin in dict.fromkeys(thirdPartyPlugins)
+                                 if plugin not in commonPlugins and plugin not in osPlugins[operatingSystem]]
         else:
             thirdPartyPlugins = []
 
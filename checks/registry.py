@@ -0,0 +1,154 @@
+import importlib
+import time
+from collections import namedtuple
+
+from .vars import *
+from .utils.utils import *
+from .utils import metrics
+from .utils.parsedlog import parseLog
+
+
+# A check runs when the detected operating system is one of its platforms
+# (or unknown), and at least one of its trigger terms occurs in the log.
+# Checks without platforms apply everywhere, checks without triggers always
+# run. Triggers must only list terms without which the check cannot fire.
+#
+# Checks are registered by module and function name. A check module is only
+# imported once one of its checks can apply, see loadChecks, so a log of one
+# platform doesn't load the checks (and version tables) of the others.
+class Check(namedtuple('Check', 'module, name, platforms, triggers')):
+    __slots__ = ()
+
+    @property
+    def func(self):
+        return getattr(importlib.import_module('.' + self.module, __package__), self.name)
+
+
+WINDOWS = ('windows',)
+MAC = ('mac',)
+LINUX = ('linux',)
+
+
+def _check(module, name, platforms=None, triggers=None):
+    if triggers:
+        registerTerms(*triggers)
+    return Check(module, name, platforms, triggers)
+
+
+# In the order the results are reported
+checkRegistry = [
+    _check('core', 'checkObsVersion'),
+    _check('core', 'checkDual', triggers=('Warning: OBS is already running!',)),
+    _check('core', 'checkAutoconfig', triggers=('Auto-config wizard',)),
+    _check('core', 'checkCPU', triggers=('CPU Name',)),
+    _check('graphics', 'checkAMDdrivers', triggers=('The AMF Runtime is very old and unsupported',)),
+    _check('graphics', 'checkNVIDIAdrivers', triggers=('[obs-nvenc] Current driver version does not support this NVENC version, please upgrade your driver',
+                                                       '[NVENC] Test process failed: outdated_driver')),
+    _check('windows', 'checkGPU', WINDOWS, ('Loading up D3D11',)),
+    _check('windows', 'checkRefreshes', WINDOWS, ('refresh=',)),
+    _check('graphics', 'checkInit', triggers=('Failed to initialize video',)),
+    _check('linux', 'checkWayland', LINUX, ('Session Type:',)),
+    _check('graphics', 'checkNVIDIAdriversEGL', LINUX, ('Using EGL/X11',)),
+    _check('encoding', 'checkNVENC', triggers=('Failed to open NVENC codec',)),
+    _check('graphics', 'check940', triggers=('NVIDIA GeForce 940',)),
+    _check('network', 'checkKiller', triggers=('Interface: Killer',)),
+    _check('network', 'checkWifi', triggers=('802.11',)),
+    _check('network', 'checkBind', triggers=('Binding to ',)),
+    _check('windows', 'checkWindowsVer', WINDOWS, ('Windows Version:',)),
+    _check('windows', 'checkWindowsARM64', WINDOWS, ('Windows Version:',)),
+    _check('macos', 'checkMacVer', MAC, ('OS Version:',)),
+    _check('windows', 'checkAdmin', WINDOWS, ('Running as administrator',)),
+    _check('windows', 'checkGCAdmin', WINDOWS, ('could not open process:',)),
+    _check('plugins', 'checkImports', triggers=("' not loaded", "' compiled with newer libobs")),
+    _check('windows', 'check32bitOn64bit', WINDOWS, ('Windows Version',)),
+    _check('windows', 'checkWindowsARM64EmulationStatus', WINDOWS, ('Windows ARM64: Running with x64 emulation',)),
+    _check('macos', 'checkRosettaTranslationStatus', MAC, ('Rosetta translation used: true',)),
+    _check('encoding', 'checkAttempt'),
+    _check('encoding', 'checkMP4', triggers=('Writing file ',)),
+    _check('encoding', 'checkPreset', triggers=('x264 encoder:',)),
+    _check('encoding', 'checkCustom', triggers=("'adv_ffmpeg_output':",)),
+    _check('sources', 'checkBrowserAccel', triggers=('Browser Hardware Acceleration: false',
+                                                     '[obs-browser]: Blacklisted device detected, disabling browser source hardware acceleration')),
+    _check('audio', 'checkAudioBuffering', triggers=('Max audio buffering reached!', 'total audio buffering is now')),
+    _check('network', 'checkDrop'),
+    _check('graphics', 'checkRenderLag', triggers=('rendering lag',)),
+    _check('encoding', 'checkEncodeError', triggers=('Error encoding with encoder',)),
+    _check('encoding', 'checkEncoding', triggers=('skipped frames',)),
+    _check('sources', 'checkMulti', triggers=('user is forcing shared memory',)),
+    _check('encoding', 'checkStreamSettings', triggers=("stream'] settings:",)),
+    _check('windows', 'checkMicrosoftSoftwareGPU', WINDOWS, ('Microsoft Basic Render Driver',)),
+    _check('windows', 'checkWasapiSamples', WINDOWS, (' Hz] initialized',)),
+    _check('windows', 'checkOpenGLonWindows', WINDOWS, ('Warning: The OpenGL renderer is currently in use.',)),
+    _check('windows', 'checkGameDVR', WINDOWS, ('Game DVR Background Recording: On',)),
+    _check('windows', 'checkGameMode', WINDOWS, ('Game Mode: On', 'Game Mode: Off')),
+    _check('windows', 'checkWin10Hags', WINDOWS, ('Hardware GPU Scheduler: On', 'Hardware GPU Scheduler: Probably On',
+                                                  'Hardware-Accelerated GPU Scheduling enabled on adapter!')),
+    _check('network', 'checkNICSpeed', triggers=('Interface: ',)),
+    _check('network', 'checkDynamicBitrate', triggers=('Dynamic bitrate enabled',)),
+    _check('network', 'checkNetworkOptimizations', triggers=('New socket loop enabled by user',)),
+    _check('network', 'checkTCPPacing', triggers=('Low latency mode enabled by user',)),
+    _check('network', 'checkStreamDelay', triggers=('second delay active',)),
+    _check('encoding', 'checkUnknownEncoder', triggers=('Encoder ID',)),
+    _check('sources', 'checkBrowserSource', triggers=("Source ID 'browser_source' not found",)),
+    _check('audio', 'checkMonitoringDevice', WINDOWS, ('audio_monitor_init_wasapi: Failed',)),
+    _check('plugins', 'checkPluginList', triggers=(MODULES_MARKER,)),
+    _check('network', 'checkVantage', triggers=('Lenovo Vantage / Legion Edge is installed.',)),
+    _check('core', 'checkPortableMode', triggers=('Portable mode: true',)),
+    _check('core', 'checkSafeMode', triggers=('Safe Mode enabled.',)),
+    _check('linux', 'checkSnapPackage', LINUX, ('Distribution:',)),
+    _check('linux', 'checkX11Captures', LINUX, ('Session Type:',)),
+    _check('linux', 'checkMissingModules', LINUX, ('Distribution:',)),
+    _check('linux', 'checkLinuxVCam', LINUX, ('v4l2loopback not installed',)),
+    _check('macos', 'checkMacPermissions', MAC, ('[macOS] Permission for',)),
+    _check('network', 'checkServiceRecommendations', triggers=('User is ignoring service bitrate limits.',)),
+    _check('linux', 'checkLinuxSystemInfo', LINUX, ('Flatpak Runtime:', 'Distribution:')),
+    _check('graphics', 'checkLLVMpipe', triggers=('OpenGL on adapter Mesa llvmpipe',)),
+]
+
+
+def forPlatform(check, operatingSystem):
+    return not check.platforms or not operatingSystem or operatingSystem in check.platforms
+
+
+def loadChecks(operatingSystem=None):
+    """Imports the modules of the checks for operatingSystem (all of them if it's
+    None). Their terms are registered on import, so this comes before indexing."""
+    for module in sorted(set(check.module for check in checkRegistry if forPlatform(check, operatingSystem))):
+        importlib.import_module('.' + module, __package__)
+
+
+def isApplicable(check, lines, operatingSystem):
+    if not forPlatform(check, operatingSystem):
+        return False
+    if check.triggers and not any(containsTerm(term, lines) for term in check.triggers):
+        return False
+    return True
+
+
+checkSeconds = metrics.Histogram('loganalyzer_check_seconds', 'Run time of each check.', metrics.CHECK_BUCKETS, 'check')
+
+
+def timeCheck(check, lines):
+    """Runs a check. Returns its result and run time in seconds."""
+    start = time.perf_counter()
+    result = check.func(lines)
+    return result, time.perf_counter() - start
+
+
+def recordChecks(checks, timed):
+    """Records the run times of timeCheck results in checkSeconds. Returns the results."""
+    results = []
+    for check, (result, seconds) in zip(checks, timed):
+        checkSeconds.observe(seconds, check.name)
+        results.append(result)
+    return results
+
+
+def runChecks(lines, checks):
+    return recordChecks(checks, [timeCheck(check, lines) for check in checks])
+
+
+def selectChecks(lines):
+    """Returns the registered checks that apply to the log, in reporting order."""
+    operatingSystem = parseLog(lines).operatingSystem
+    return [check for check in checkRegistry if isApplicable(check, lines, operatingSystem)]
@@ -1,5 +1,15 @@
 from .vars import *
 from .utils.utils import *
+from .utils.parsedlog import parseLog
+
+
+registerTerms(
+    'user is forcing shared memory',
+    'Browser Hardware Acceleration: false',
+    '[obs-browser]: Blacklisted device detected, disabling browser source hardware acceleration',
+    ' - source:',
+    'User added source',
+    "Source ID 'browser_source' not found")
 
 
 def checkMulti(lines):
@@ -9,11 +19,11 @@ def checkMulti(lines):
                 """SLI/Crossfire Capture Mode (aka 'Shared memory capture') is very slow, and only to be used on SLI & Crossfire systems. <br><br>If you're using a laptop or a display with multiple graphics cards and your game is only running on one of them, consider switching OBS to run on the same GPU instead of enabling this setting. Guide available <a href="https://obsproject.com/wiki/Laptop-Troubleshooting">here</a>."""]
 
 
-def checkSources(lower, higher, lines):
+def checkSources(parsed, scene):
     res = None
     violation = False
-    monitor = search('monitor_capture', lines[lower:higher])
-    game = search('game_capture', lines[lower:higher])
+    monitor = parsed.sources(scene, 'monitor_capture')
+    game = parsed.sources(scene, 'game_capture')
     if (len(monitor) > 0 and len(game) > 0):
         res = []
         res.append([LEVEL_WARNING, "Capture Interference",
@@ -41,18 +51,13 @@ def checkBrowserAccel(lines):
 def parseScenes(lines):
     ret = []
     hit = False
-    sceneLines = getScenes(lines)
+    parsed = parseLog(lines)
+    scenes = parsed.scenes
     sourceLines = search(' - source:', lines)
     added = search('User added source', lines)
-    if ((len(sceneLines) > 0) and (len(sourceLines) > 0)):
-        sections = getSections(lines)
-        higher = 0
-        for s in sceneLines:
-            if (s != sceneLines[-1]):
-                higher = getNextPos(s, sceneLines)
-            else:
-                higher = getNextPos(s, sections)
-            m, h = checkSources(s, higher, lines)
+    if ((len(scenes) > 0) and (len(sourceLines) > 0)):
+        for scene in scenes:
+            m, h = checkSources(parsed, scene)
             if (not hit and m not in ret):
                 ret.append(m)
                 hit = h
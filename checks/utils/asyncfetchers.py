@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+
+import aiohttp
+
+from . import fetchers
+from .utils import LogLinesBuilder
+
+
+# Async counterparts of the fetchers, for the web server. Downloads run on the
+# event loop. Plain text logs are split and indexed in the executor while they
+# download; everything else CPU bound is left to the caller's executor. Limits
+# are shared with the sync client (fetchers.connectTimeout, readTimeout,
+# totalTimeout and maxLogBytes).
+
+# Only touched from the event loop
+_stats = {"requests": 0, "timeouts": 0, "oversized": 0, "connections": 0, "reused": 0}
+
+
+async def _connectionCreated(session, context, params):
+    _stats["connections"] += 1
+
+
+async def _connectionReused(session, context, params):
+    _stats["reused"] += 1
+
+
+def createSession():
+    """Client session with a keep-alive connection pool. Create and close it on the event loop."""
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_end.append(_connectionCreated)
+    trace.on_connection_reuseconn.append(_connectionReused)
+    connector = aiohttp.TCPConnector(limit=100, limit_per_host=16, keepalive_timeout=30)
+    return aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+
+
+def fetchStats():
+    return dict(_stats)
+
+
+async def _download(session, url, consume):
+    # GETs url and passes the body to `await consume(chunk)` as it arrives,
+    # enforcing the timeouts and size cap. Returns (status, charset); error
+    # statuses raise FetchError.
+    _stats["requests"] += 1
+    # total bounds the whole download, the socket timeouts alone let a trickling host hold it open
+    timeout = aiohttp.ClientTimeout(total=fetchers.totalTimeout, sock_connect=fetchers.connectTimeout,
+                                    sock_read=fetchers.readTimeout)
+    try:
+        async with session.get(url, timeout=timeout) as resp:
+            if resp.status >= 400:
+                raise fetchers.FetchError("HTTP {}".format(resp.status))
+            if (resp.content_length or 0) > fetchers.maxLogBytes:
+                _stats["oversized"] += 1
+                logging.warning('Fetch refused, more than {} bytes: {}'.format(fetchers.maxLogBytes, url))
+                raise fetchers.LogTooLarge("more than {} bytes".format(fetchers.maxLogBytes))
+            size = 0
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                size += len(chunk)
+                if size > fetchers.maxLogBytes:
+                    _stats["oversized"] += 1
+                    logging.warning('Fetch aborted, more than {} bytes: {}'.format(fetchers.maxLogBytes, url))
+                    raise fetchers.LogTooLarge("more than {} bytes".format(fetchers.maxLogBytes))
+                await consume(chunk)
+            return resp.status, resp.charset
+    except asyncio.TimeoutError as e:
+        _stats["timeouts"] += 1
+        logging.warning('Fetch timed out ({}s connect, {}s read, {}s total): {}'.format(
+            fetchers.connectTimeout, fetchers.readTimeout, fetchers.totalTimeout, url))
+        raise fetchers.FetchError("timeout") from e
+    except aiohttp.ClientError as e:
+        # Refused connections, DNS failures, resets and truncated bodies
+        logging.warning('Fetch failed ({}): {}'.format(type(e).__name__, url))
+        raise fetchers.FetchError(type(e).__name__) from e
+
+
+async def fetch(session, url):
+    """GETs url, reading the body up to fetchers.maxLogBytes. Returns (status, body, charset).
+    Raises fetchers.FetchError for error statuses, timeouts, connection errors and
+    (as LogTooLarge) past the cap."""
+    body = bytearray()
+
+    async def consume(chunk):
+        body.extend(chunk)
+
+    status, charset = await _download(session, url, consume)
+    return status, bytes(body), charset
+
+
+async def fetchStream(session, url):
+    """GETs a plain text log, splitting and indexing it in the executor while it
+    downloads. Returns (status, LogLinesBuilder); call finish() on the builder
+    (in the executor too) for the indexed LogLines."""
+    loop = asyncio.get_running_loop()
+    builder = LogLinesBuilder()
+    pending = None
+    batch = bytearray()
+
+    async def consume(chunk):
+        nonlocal pending, batch
+        batch += chunk
+        # One feed at a time, in order; chunks arriving meanwhile are batched
+        if pending is None or pending.done():
+            if pending is not None:
+                pending.result()
+            pending = loop.run_in_executor(None, builder.feed, bytes(batch))
+            batch = bytearray()
+
+    try:
+        status, charset = await _download(session, url, consume)
+    finally:
+        if pending is not None:
+            await pending
+    if charset is not None and charset.lower() not in ('utf-8', 'utf8', 'us-ascii', 'ascii'):
+        # Rare: re-encode the whole log as UTF-8
+        data = bytes(builder.buffer + batch).decode(charset, 'replace').encode('utf-8')
+        builder = LogLinesBuilder()
+        batch = data
+    if batch:
+        await loop.run_in_executor(None, builder.feed, bytes(batch))
+    return status, builder
+
+
+async def fetchText(session, url):
+    status, body, charset = await fetch(session, url)
+    return status, body.decode(charset or 'utf-8', 'replace')
+
+
+async def fetchJson(session, url):
+    status, body, charset = await fetch(session, url)
+    try:
+        return json.loads(body.decode(charset or 'utf-8', 'replace'))
+    except ValueError as e:
+        raise fetchers.FetchError("invalid JSON") from e
+
+
+def _finishStream(builder):
+    logLines = builder.finish()
+    return logLines, fetchers.getDescription(logLines)
+
+
+async def fetchLog(session, provider, logId):
+    """Downloads a log from its provider (see fetchers.classifyUrl), like
+    fetchers.getProviderLog does. Returns the payload and a function that turns
+    it into (lines, description), or (None, None) if there is no log. Raises
+    fetchers.FetchError if the download fails."""
+    url = provider.logUrl(logId)
+    if provider.parse is not None:
+        return await fetchJson(session, url), provider.parse
+    status, builder = await fetchStream(session, url)
+    if status == 200 and len(builder.buffer) > 0:
+        return builder, _finishStream
+    return None, None
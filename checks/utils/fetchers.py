@@ -1,117 +1,364 @@
-import requests
+import collections
+import json
+import logging
 import re
+import threading
+import time
+import urllib.parse
 
+from .loglines import LogLines
 
-# gist.github.com
+
+# shared http client
 # --------------------------------------
 
+# All fetches go through one connection pool per host, kept alive between
+# requests. Each thread gets its own Session (cookies aren't thread safe),
+# but they all mount the same adapter, whose pools are. requests is imported
+# by the first fetch: analyzing local files, or serving with the async client,
+# doesn't load it.
+connectTimeout = 5
+readTimeout = 30
+totalTimeout = 120  # for the whole download, a trickling host can't hold it open
+maxLogBytes = 64 * 1024 * 1024
 
-def matchGist(url):
-    return re.match(
-        r"(?i)\b((?:https?:(?:/{1,3}gist\.github\.com)/)(anonymous/)?([a-z0-9]{32}))", url)
+_adapter = None
+_adapterLock = threading.Lock()
+_local = threading.local()
+_statsLock = threading.Lock()
+_stats = {"requests": 0, "timeouts": 0, "oversized": 0}
 
 
-def getGist(inputUrl):
-    API_URL = "https://api.github.com"
-    gistId = inputUrl
-    return requests.get('{0}/gists/{1}'.format(API_URL, gistId)).json()
+class FetchError(Exception):
+    """A log couldn't be fetched. The message is the reason, e.g. 'HTTP 404'."""
+    pass
 
 
-def getLinesGist(gistObject):
-    files = [(v, k) for (k, v) in gistObject['files'].items()]
-    return files[0][0]['content'].split('\n')
+class LogTooLarge(FetchError):
+    pass
 
 
-def getDescriptionGist(gistObject):
-    desc = gistObject['description']
-    if (desc == ""):
-        desc = gistObject['id']
-    return [0, "DESCRIPTION", desc]
+def getAdapter():
+    global _adapter
+    with _adapterLock:
+        if _adapter is None:
+            from requests.adapters import HTTPAdapter
+            _adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+    return _adapter
 
 
-# hastebin.com
-# --------------------------------------
+def getSession():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        import requests
+        adapter = getAdapter()
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
 
 
-def matchHaste(url):
-    return re.match(
-        r"(?i)\b((?:https?:(?:/{1,3}(www\.)?hastebin\.com)/)([a-z0-9]{10}))", url)
+def _count(key):
+    with _statsLock:
+        _stats[key] += 1
 
 
-def getHaste(hasteId):
-    API_URL = "https://hastebin.com"
-    return requests.get('{0}/documents/{1}'.format(API_URL, hasteId)).json()
+def _timedOut(url):
+    _count("timeouts")
+    logging.warning('Fetch timed out ({}s connect, {}s read, {}s total): {}'.format(connectTimeout, readTimeout, totalTimeout, url))
+    return FetchError("timeout")
 
 
-def getLinesHaste(hasteObject):
-    text = hasteObject['data']
-    return text.split('\n')
+def fetch(url):
+    """GETs url with the shared client, like asyncfetchers.fetch. Returns (status, body, charset).
+    The body is read up to maxLogBytes, within totalTimeout seconds. Raises FetchError for
+    error statuses, timeouts and connection errors, and (as LogTooLarge) past the cap."""
+    import requests
+    import urllib3
+    _count("requests")
+    deadline = time.monotonic() + totalTimeout
+    try:
+        resp = getSession().get(url, timeout=(connectTimeout, readTimeout), stream=True)
+        with resp:
+            if resp.status_code >= 400:
+                raise FetchError("HTTP {}".format(resp.status_code))
+            if int(resp.headers.get('Content-Length') or 0) > maxLogBytes:
+                _count("oversized")
+                logging.warning('Fetch refused, more than {} bytes: {}'.format(maxLogBytes, url))
+                raise LogTooLarge("more than {} bytes".format(maxLogBytes))
+            size = 0
+            chunks = []
+            # read1 returns what has arrived instead of waiting for a full chunk,
+            # so the deadline is checked at least every readTimeout
+            chunk = resp.raw.read1(64 * 1024, decode_content=True)
+            while chunk:
+                size += len(chunk)
+                if size > maxLogBytes:
+                    _count("oversized")
+                    logging.warning('Fetch aborted, more than {} bytes: {}'.format(maxLogBytes, url))
+                    raise LogTooLarge("more than {} bytes".format(maxLogBytes))
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise _timedOut(url)
+                chunk = resp.raw.read1(64 * 1024, decode_content=True)
+            return resp.status_code, b''.join(chunks), resp.encoding
+    except (requests.Timeout, urllib3.exceptions.TimeoutError) as e:
+        raise _timedOut(url) from e
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        # Refused connections, DNS failures, resets and truncated bodies
+        logging.warning('Fetch failed ({}): {}'.format(type(e).__name__, url))
+        raise FetchError(type(e).__name__) from e
+
+
+def fetchStats():
+    """Counters of the shared client. connections is how many were opened, the
+    remaining requests reused a kept-alive one."""
+    with _statsLock:
+        stats = dict(_stats)
+    pools = _adapter.poolmanager.pools if _adapter is not None else {}
+    stats["connections"] = 0
+    for key in pools.keys():
+        try:
+            stats["connections"] += pools[key].num_connections
+        except KeyError:
+            # evicted meanwhile
+            continue
+    stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+    return stats
+
+
+# url caches
+# --------------------------------------
 
 
-def getDescription(lines):
-    return [0, "DESCRIPTION", lines[0]]
+def canonicalUrl(url):
+    """Normalizes a URL: scheme and host are case insensitive, fragments are dropped."""
+    parts = urllib.parse.urlsplit(url.strip())
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ''))
+
+
+def canonicalKey(provider, logId):
+    """Cache key of a log, the same for every spelling of its URL (see classifyUrl)."""
+    return '{}:{}'.format(provider.name, provider.canonicalId(logId))
+
+
+class KeyStats():
+    """ Counts, per provider, the requests for a log whose URL is spelled
+    differently from the first request for it, i.e. the duplicates that
+    canonical keys collapse. Remembers the last maxEntries keys. Thread safe.
+    """
+
+    def __init__(self, maxEntries=4096):
+        self.maxEntries = maxEntries
+        self.spellings = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.collapsed = collections.Counter()
+
+    def record(self, provider, key, url):
+        url = canonicalUrl(url)
+        with self.lock:
+            self.requests[provider.name] += 1
+            first = self.spellings.setdefault(key, url)
+            self.spellings.move_to_end(key)
+            if first != url:
+                self.collapsed[provider.name] += 1
+            while len(self.spellings) > self.maxEntries:
+                self.spellings.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {name: {"requests": count, "collapsed": self.collapsed[name]} for name, count in self.requests.items()}
+
+
+keyStats = KeyStats()
+
+
+class NegativeCache():
+    """ Short-lived record of logs whose fetch failed, with the reason, so that
+    dead links, deleted pastes and non-logs aren't fetched again by every
+    visitor. Keyed by key(), which needn't be the canonicalKey of the log.
+    Thread safe.
+    """
+
+    def __init__(self, ttl=300, maxEntries=4096):
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.reasons = collections.Counter()
+
+    @staticmethod
+    def key(provider, logId):
+        """Key of the failures of a log. A failure can be specific to the link
+        that was fetched, so spellings are only collapsed where they can't be:
+        links of signed providers are keyed by the URL fetched, since a link
+        with an expired signature fails where a freshly signed one works."""
+        if provider.signed:
+            return '{}:{}'.format(provider.name, provider.logUrl(logId))
+        return canonicalKey(provider, logId)
+
+    def get(self, key):
+        """Returns the reason the last fetch of the log failed, if it was recent."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self.entries[key]
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, reason):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), reason)
+            self.entries.move_to_end(key)
+            self.reasons[reason] += 1
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "reasons": dict(self.reasons)}
+
+
+negativeCache = NegativeCache()
 
 
-# obsproject.com
+# gist.github.com
 # --------------------------------------
 
 
-def matchObs(url):
-    return re.match(
-        r"(?i)\b(?P<obsLogURL>(?P<obsLogURLRoot>https?:(?:/{1,3}(?:www\.)?obsproject\.com)/(analyzer|logs))/(?P<obsLogURLFilename>.{16}))", url)
+def getLinesGist(gistObject):
+    files = [(v, k) for (k, v) in gistObject['files'].items()]
+    return LogLines.fromText(files[0][0]['content'])
 
 
-def getObslog(obsURL, obslogId):
-    return requests.get('{0}/{1}'.format(obsURL, obslogId)).text
+def getDescriptionGist(gistObject):
+    desc = gistObject['description']
+    if (desc == ""):
+        desc = gistObject['id']
+    return [0, "DESCRIPTION", desc]
 
 
-def getLinesObslog(obslogText):
-    return obslogText.split('\n')
+def parseGist(gistObject):
+    return getLinesGist(gistObject), getDescriptionGist(gistObject)
 
 
-# pastebin.com
+# hastebin.com
 # --------------------------------------
 
 
-def matchPastebin(url):
-    return re.match(
-        r"(?i)\b((?:https?:(?:/{1,3}(www\.)?pastebin\.com/))(?:raw/)?(.{8}))", url)
+def getLinesHaste(hasteObject):
+    text = hasteObject['data']
+    return LogLines.fromText(text)
 
 
-def getRawPaste(obslogId):
-    API_URL = "https://pastebin.com/raw"
-    return requests.get('{0}/{1}'.format(API_URL, obslogId)).text
+def getDescription(lines):
+    return [0, "DESCRIPTION", lines[0]]
 
 
-def getLinesPaste(obslogText):
-    return obslogText.split('\n')
+def parseHaste(hasteObject):
+    logLines = getLinesHaste(hasteObject)
+    return logLines, getDescription(logLines)
 
 
-# discord
+# providers
 # --------------------------------------
 
-
-def matchDiscord(url):
-    return re.match(
-        r"(?i)\b((?:https?:(?:/{1,3}cdn\.discordapp\.com)/)(attachments/)([0-9]{18,}/[0-9]{18,}/(?:[0-9\-\_]{19}|message).txt(?:\?\S+\&)?))", url)
-
-
-def getRawDiscord(obslogId):
-    API_URL = "https://cdn.discordapp.com/attachments"
-    resp = requests.get('{0}/{1}'.format(API_URL, obslogId))
-    if resp.status_code == 200:
-        return resp.text
-    return ""
-
-
-def getLinesDiscord(obslogText):
-    return obslogText.split('\n')
+# A provider is a host logs can be linked from. Its pattern recognizes the
+# URLs (case insensitive, named groups prefixed with the provider name),
+# logId extracts the log ID from the match and logUrl turns the ID into the
+# download URL. parse turns a JSON API response into (lines, description);
+# providers without it serve the log as plain text. canonicalId reduces the
+# ID to the part that identifies the log, for canonicalKey. signed providers
+# put expiring signatures in their links, so failures are keyed by the link
+# (see NegativeCache.key).
+Provider = collections.namedtuple('Provider', 'name, pattern, logId, logUrl, parse, canonicalId, signed')
+
+
+def _provider(name, pattern, logId, logUrl, parse=None, canonicalId=str, signed=False):
+    return Provider(name, re.compile(pattern, re.IGNORECASE), logId, logUrl, parse, canonicalId, signed)
+
+
+def _obsFilename(path):
+    # /logs/ and /analyzer/ links name the same file
+    return path.rsplit('/', 1)[-1]
+
+
+def _withoutQuery(path):
+    # Discord signs attachment links with expiring ?ex=&is=&hm= parameters
+    return path.split('?', 1)[0]
+
+
+# In the order URLs are matched against
+providerRegistry = [
+    _provider('gist',
+              r"\b(?:https?:(?:/{1,3}gist\.github\.com)/)(?:anonymous/)?(?P<gistId>[a-z0-9]{32})",
+              lambda m: m['gistId'],
+              'https://api.github.com/gists/{}'.format,
+              parseGist, str.lower),
+    _provider('haste',
+              r"\b(?:https?:(?:/{1,3}(?:www\.)?hastebin\.com)/)(?P<hasteId>[a-z0-9]{10})",
+              lambda m: m['hasteId'],
+              'https://hastebin.com/documents/{}'.format,
+              parseHaste, str.lower),
+    _provider('obs',
+              r"\bhttps?:(?:/{1,3}(?:www\.)?obsproject\.com)/(?P<obsPath>(?:analyzer|logs)/.{16})",
+              lambda m: m['obsPath'],
+              'https://obsproject.com/{}'.format,
+              canonicalId=_obsFilename),
+    _provider('pastebin',
+              r"\b(?:https?:(?:/{1,3}(?:www\.)?pastebin\.com/))(?:raw/)?(?P<pastebinId>.{8})",
+              lambda m: m['pastebinId'],
+              'https://pastebin.com/raw/{}'.format),
+    _provider('discord',
+              r"\b(?:https?:(?:/{1,3}cdn\.discordapp\.com)/)attachments/"
+              r"(?P<discordPath>[0-9]{18,}/[0-9]{18,}/(?:[0-9\-\_]{19}|message).txt(?:\?\S+\&)?)",
+              lambda m: m['discordPath'],
+              'https://cdn.discordapp.com/attachments/{}'.format,
+              canonicalId=_withoutQuery, signed=True),
+]
+
+# All patterns as one alternation, so a URL is classified with a single match
+_providerPattern = re.compile('|'.join('(?P<{}>{})'.format(p.name, p.pattern.pattern) for p in providerRegistry),
+                              re.IGNORECASE)
+_providersByName = {p.name: p for p in providerRegistry}
+
+
+def classifyUrl(url):
+    """Returns (provider, log ID) for a log URL, or None if no provider hosts it."""
+    m = _providerPattern.match(url)
+    if m is None:
+        return None
+    provider = _providersByName[m.lastgroup]
+    return provider, provider.logId(m)
+
+
+def getProviderLog(provider, logId):
+    """Fetches a log from its provider. Returns its lines and description message,
+    or (None, None) if there is no log. Raises FetchError if the download fails."""
+    status, body, charset = fetch(provider.logUrl(logId))
+    if provider.parse is not None:
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise FetchError("invalid JSON") from e
+        return provider.parse(payload)
+    if status != 200 or len(body) == 0:
+        return None, None
+    logLines = LogLines.fromText(body.decode(charset or 'utf-8', 'replace'))
+    return logLines, getDescription(logLines)
 
 
 # local file
 def getLinesLocal(filename):
     try:
-        with open(filename, "r") as f:
-            return f.readlines()
+        return LogLines.fromFile(filename)
     except:
         return
@@ -0,0 +1,128 @@
+import array
+import bisect
+import collections.abc
+import mmap
+
+
+class LogLines(collections.abc.Sequence):
+    """ Read-only sequence of the lines of a log, stored as one UTF-8 buffer and
+    an array of line start offsets instead of a list of strings.
+
+    Lines are decoded on access, without their line break (a trailing '\\r'
+    is dropped as well, so CRLF logs read the same as LF ones). Slicing
+    returns a view sharing the buffer. Substring and regex searches run over
+    the whole buffer and map match offsets back to line numbers by bisection.
+    """
+
+    __slots__ = ('buffer', 'offsets', 'start', 'stop', 'termIndex', 'parsed', '__weakref__')
+
+    def __init__(self, buffer, offsets, start=0, stop=None):
+        # offsets[i] is where line i starts, offsets[-1] is one past the end of
+        # the buffer, as if it ended with a line break
+        self.buffer = buffer
+        self.offsets = offsets
+        self.start = start
+        self.stop = len(offsets) - 1 if stop is None else stop
+        self.termIndex = None
+        self.parsed = None  # ParsedLog, see parsedlog.parseLog
+
+    @classmethod
+    def fromBytes(cls, buffer):
+        offsets = array.array('q', [0])
+        find = buffer.find
+        pos = find(b'\n')
+        while pos >= 0:
+            offsets.append(pos + 1)
+            pos = find(b'\n', pos + 1)
+        offsets.append(len(buffer) + 1)
+        return cls(buffer, offsets)
+
+    @classmethod
+    def fromText(cls, text):
+        return cls.fromBytes(text.encode('utf-8', 'surrogateescape'))
+
+    @classmethod
+    def fromLines(cls, lines):
+        return cls.fromText('\n'.join(lines))
+
+    @classmethod
+    def fromFile(cls, filename):
+        with open(filename, "rb") as f:
+            try:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                buffer = b''
+        return cls.fromBytes(buffer)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def _line(self, i):
+        line = self.buffer[self.offsets[i]:self.offsets[i + 1] - 1]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        return line.decode('utf-8', 'replace')
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            stop = max(start, stop)
+            return LogLines(self.buffer, self.offsets, self.start + start, self.start + stop)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('line index out of range')
+        return self._line(self.start + i)
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self._line(i)
+
+    def __repr__(self):
+        start, end = self.byteRange()
+        return '<LogLines: {} lines, {} bytes>'.format(len(self), end - start)
+
+    def toBytes(self):
+        """The log content as UTF-8, lines separated by '\\n' (CRs are kept)."""
+        start, end = self.byteRange()
+        return bytes(self.buffer[start:end])
+
+    def byteRange(self, start=0, end=None):
+        """Buffer offsets spanning lines[start:end], line breaks excluded at the end."""
+        end = len(self) if end is None else min(end, len(self))
+        start = min(max(start, 0), end)
+        return self.offsets[self.start + start], max(self.offsets[self.start + end] - 1, self.offsets[self.start + start])
+
+    def lineAt(self, pos):
+        """Index of the line containing buffer offset pos."""
+        return bisect.bisect_right(self.offsets, pos, self.start, self.stop) - 1 - self.start
+
+    def findLines(self, term, start=0, end=None):
+        """Ascending indices of the lines in [start, end) that contain the substring term."""
+        if isinstance(term, str):
+            term = term.encode('utf-8')
+        pos, limit = self.byteRange(start, end)
+        find = self.buffer.find
+        found = []
+        pos = find(term, pos, limit)
+        while pos >= 0:
+            i = self.lineAt(pos)
+            found.append(i)
+            # skip to the next line, each line is reported once
+            pos = find(term, self.offsets[self.start + i + 1], limit)
+        return found
+
+    def matchLines(self, pattern, start=0, end=None):
+        """Ascending indices of the lines in [start, end) matching the compiled bytes pattern.
+        Matches must not span line breaks."""
+        pos, limit = self.byteRange(start, end)
+        found = []
+        m = pattern.search(self.buffer, pos, limit)
+        while m:
+            i = self.lineAt(m.start())
+            found.append(i)
+            m = pattern.search(self.buffer, self.offsets[self.start + i + 1], limit)
+        return found
@@ -1,8 +1,10 @@
 import datetime
 import re
 
+from .utils import LazyPattern
 
-macver_re = re.compile(r"""
+
+macver_re = LazyPattern(r"""
     (?i)
     OS\sVersion:\sVersion\s
     (?P<major>[0-9]+)
@@ -0,0 +1,101 @@
+import bisect
+import threading
+
+
+# Metrics in the Prometheus text exposition format, served by the web server
+# at /metrics. Recording a value is a bisection and two additions under a
+# lock, cheap enough to leave on in the analysis path. Values are per
+# process: nothing recorded in worker processes is seen here.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CHECK_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(9))  # 1 KB to 64 MB
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    pairs = [(k, v) for k, v in pairs if k is not None]
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Histogram():
+    """ Distribution of observed values over fixed buckets, optionally split by
+    one label. Thread safe.
+    """
+
+    def __init__(self, name, help, buckets, label=None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.label = label
+        self.series = {}  # label value: [counts per bucket and +Inf, sum]
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, labelValue=None):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labelValue)
+            if series is None:
+                series = self.series[labelValue] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][i] += 1
+            series[1] += value
+
+    def expose(self):
+        with self.lock:
+            series = [(labelValue, list(counts), total) for labelValue, (counts, total) in self.series.items()]
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        for labelValue, counts, total in sorted(series, key=lambda s: str(s[0])):
+            label = (self.label, labelValue)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(float(bound))
+                lines.append('{}_bucket{} {}'.format(self.name, _labels((label, ('le', le))), cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, _labels((label,)), _number(float(total))))
+            lines.append('{}_count{} {}'.format(self.name, _labels((label,)), cumulative))
+        return lines
+
+
+class Collected():
+    """ Counter or gauge whose value is read when the metrics are exposed.
+    collect returns a number, or a dict of label value: number.
+    """
+
+    def __init__(self, name, help, type, collect, label=None):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.collect = collect
+        self.label = label
+        _registry.append(self)
+
+    def expose(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {None: values}
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} {}'.format(self.name, self.type)]
+        for labelValue, value in sorted(values.items(), key=lambda v: str(v[0])):
+            lines.append('{}{} {}'.format(self.name, _labels(((self.label, labelValue),)), _number(value)))
+        return lines
+
+
+def exposition():
+    """All registered metrics in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
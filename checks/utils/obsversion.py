@@ -1,5 +1,6 @@
 from collections import namedtuple
-import re
+
+from .utils import LazyPattern
 
 
 class ObsVersion():
@@ -12,7 +13,7 @@ class ObsVersion():
     and `<patch>` (optional) being any number of digits, optionally preceded by a dot
     """
     _nan = float('nan')
-    _regex = re.compile(r"(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(-(?P<beta_type>alpha|beta|rc)\.?(?P<beta_patch>\d*))?(-(?P<modified>modified))?((-|\+)(?P<trail>[0-9A-Za-z-]+))?")
+    _regex = LazyPattern(r"(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(-(?P<beta_type>alpha|beta|rc)\.?(?P<beta_patch>\d*))?(-(?P<modified>modified))?((-|\+)(?P<trail>[0-9A-Za-z-]+))?")
     _VersionNum = namedtuple('VersionNum', 'major, minor, patch, beta_type, beta_patch')
     _beta_types = {"alpha": 0,
                    "beta": 1,
@@ -0,0 +1,395 @@
+import array
+import bisect
+import collections
+import weakref
+
+from .utils import *
+
+
+# Structure of a log that several checks need, derived once per log by
+# parseLog and cached on the lines. Everything is located through the term
+# index; only the header, the module list and the lines of the blocks below are
+# read. Checks can use it or keep working on the plain lines.
+
+VIDEO_RESET_MARKER = 'video settings reset:'
+ENCODER_MARKER = '] settings:'
+SOURCE_MARKER = ' - source:'
+# Kinds of sources the checks count. A source line ends in "'name' (kind)",
+# so they are found through the term index without reading the lines.
+SOURCE_KINDS = ('monitor_capture', 'game_capture')
+SOURCE_KIND_TERM = "' ({})"
+
+# Markers of the output sessions, by session type
+SESSION_MARKERS = (('streaming', '== Streaming Start ==', '== Streaming Stop =='),
+                   ('recording', '== Recording Start ==', '== Recording Stop =='),
+                   ('replay buffer', '== Replay Buffer Start ==', '== Replay Buffer Stop =='))
+# Lines of the timeline, by the statistic they give. The frame statistics end
+# in a percentage, audio buffering gives the total in milliseconds.
+FRAME_STATS = (('dropped', 'insufficient bandwidth'),
+               ('lagged', 'rendering lag'),
+               ('skipped', 'skipped frames'))
+TIMELINE_STATS = FRAME_STATS + (('buffering', 'total audio buffering is now'),)
+
+registerTerms(VIDEO_RESET_MARKER, ENCODER_MARKER, SOURCE_MARKER)
+registerTerms(*(SOURCE_KIND_TERM.format(kind) for kind in SOURCE_KINDS))
+registerTerms(*(marker for _, start, stop in SESSION_MARKERS for marker in (start, stop)))
+registerTerms(*(term for _, term in TIMELINE_STATS))
+
+timestamp_re = LazyPattern(r"(\d+):(\d\d):(\d\d)(\.\d+)?: ")
+buffering_re = LazyPattern(r"total audio buffering is now (\d+) milliseconds")
+encoder_re = LazyPattern(r"\[(?P<encoder>[^:\]]+): '(?P<name>[^']*)'\] settings:")
+
+# settings: dict of the indented key: value lines following the marker line
+VideoReset = collections.namedtuple('VideoReset', 'line, settings')
+Encoder = collections.namedtuple('Encoder', 'line, encoder, name, settings')
+# sources of a scene are the lines in [line, end), see ParsedLog.sources
+Scene = collections.namedtuple('Scene', 'line, end')
+# start and stop are the marker lines, stop is None if the session wasn't
+# stopped. Its output statistics are read from [start, end), end being the
+# next session start after the stop, so that lines logged on stopping count
+# (for sessions that weren't stopped, the next start of the same type).
+# videoSettings and encoders are the last ones logged before the start, one
+# Encoder per encoder name. duration is in seconds, stats a SeriesStats per
+# statistic of TIMELINE_STATS. dropped, lagged and skipped are the highest
+# percentages the statistics lines gave.
+OutputSession = collections.namedtuple('OutputSession',
+                                       'kind, start, stop, end, videoSettings, encoders, duration, stats, dropped, lagged, skipped')
+# Values of a statistic in log order: arrays of line indices, seconds since the
+# first timestamp of the log and values
+Series = collections.namedtuple('Series', 'lines, times, values')
+# Of the values of a series in a session; perMinute is None for sessions without duration
+SeriesStats = collections.namedtuple('SeriesStats', 'count, p50, p95, max, perMinute')
+
+
+def stripTimestamp(line):
+    m = timestamp_re.match(line)
+    return line[m.end():] if m else line
+
+
+def clockSeconds(line):
+    """Seconds since midnight of the timestamp of line, None if it has none."""
+    m = timestamp_re.match(line)
+    if m:
+        return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3)) + float(m.group(4) or 0)
+
+
+def percentile(ordered, q):
+    """Nearest rank percentile q (0 to 100) of the ascending values."""
+    return ordered[max(0, min(len(ordered) - 1, int(len(ordered) * q / 100 + 0.5) - 1))]
+
+
+def seriesStats(values, duration):
+    if not values:
+        return SeriesStats(0, None, None, None, None)
+    ordered = sorted(values)
+    perMinute = round(len(values) * 60 / duration, 3) if duration else None
+    return SeriesStats(len(values), percentile(ordered, 50), percentile(ordered, 95), ordered[-1], perMinute)
+
+
+def downsample(series, points):
+    """At most points [seconds, value] pairs of the series: its time span is cut
+    into that many buckets, and each keeps its highest value."""
+    times, values = series.times, series.values
+    if len(times) <= points:
+        return [[round(t, 3), v] for t, v in zip(times, values)]
+    first = times[0]
+    width = (times[-1] - first) / points or 1
+    buckets = {}
+    for t, v in zip(times, values):
+        k = min(int((t - first) / width), points - 1)
+        best = buckets.get(k)
+        if best is None or v > best[1]:
+            buckets[k] = [round(t, 3), v]
+    return [buckets[k] for k in sorted(buckets)]
+
+
+def percentIn(line):
+    """The percentage in parentheses of an output statistics line, 0 if there is none."""
+    try:
+        return float(line[line.find("(") + 1: line.find(")")].strip('%').replace(",", "."))
+    except (ValueError, OverflowError):
+        return 0
+
+
+def platformOf(line):
+    """The operating system a header line names, None if it names none."""
+    if 'mac' in line:
+        return "mac"
+    elif 'windows' in line:
+        return "windows"
+    elif 'linux' in line:
+        return "linux"
+
+
+# Header lines read by sniffOperatingSystem
+HEADER_LINES = 200
+
+
+def sniffOperatingSystem(lines, limit=HEADER_LINES):
+    """The operating system ParsedLog finds in the header, read from the first
+    limit lines before the log is indexed. None if the header doesn't end there."""
+    operatingSystem = None
+    for i in range(min(limit, len(lines))):
+        s = lines[i]
+        if SUBSECTION_SEPARATOR in s:
+            return operatingSystem
+        if operatingSystem is None:
+            operatingSystem = platformOf(s)
+
+
+def _keyValue(text):
+    key, sep, value = text.partition(':')
+    if sep:
+        return key.strip(), value.strip()
+
+
+class ParsedLog():
+    """ Typed view of the structure of a log.
+
+    headerEnd: index of the first subsection separator, None if there is none
+    facts: key: value pairs of the header lines, the first of each key
+    operatingSystem: "windows", "mac", "linux" or None
+    moduleStart, moduleEnd: lines of the loaded modules marker and the separator after it
+    modules: file names in the loaded modules list
+    videoResets, encoders: VideoReset and Encoder blocks in log order
+    scenes: Scene line ranges of the loaded scenes
+    timeline: per statistic of TIMELINE_STATS, its Series
+    sessions: OutputSession index, ordered by start
+
+    Line indices are those of the parsed lines. The header is read right away
+    up to the operating system, the facts and other blocks on first access.
+    """
+
+    __slots__ = ('lines', 'headerEnd', 'operatingSystem', 'moduleStart', 'moduleEnd', '_facts',
+                 '_modules', '_videoResets', '_encoders', '_scenes', '_sources', '_timeline', '_sessions')
+
+    def __init__(self, lines):
+        try:
+            # The lines keep a reference to this, don't keep them alive in turn
+            self.lines = weakref.proxy(lines)
+        except TypeError:
+            self.lines = lines
+        self._facts = self._modules = self._videoResets = self._encoders = self._scenes = None
+        self._sources = {}
+        self._timeline = self._sessions = None
+        self._parseHeader()
+        loaded = getLoadedModules(lines)
+        self.moduleStart = loaded[0] if loaded else None
+        self.moduleEnd = None if self.moduleStart is None else getNextPos(self.moduleStart, getSubSections(lines))
+
+    def _parseHeader(self):
+        subSections = getSubSections(self.lines)
+        self.headerEnd = subSections[0] if subSections else None
+        self.operatingSystem = None
+        for i in range(self.headerEnd or 0):
+            self.operatingSystem = platformOf(self.lines[i])
+            if self.operatingSystem is not None:
+                break
+
+    @property
+    def facts(self):
+        if self._facts is None:
+            self._facts = {}
+            for s in self.lines[:self.headerEnd or 0]:
+                fact = _keyValue(stripTimestamp(s))
+                if fact and fact[0]:
+                    self._facts.setdefault(*fact)
+        return self._facts
+
+    def _block(self, i):
+        # Indented key: value lines from i on
+        lines = self.lines
+        settings = {}
+        while i < len(lines):
+            text = stripTimestamp(lines[i])
+            if not text[:1].isspace():
+                break
+            fact = _keyValue(text)
+            if fact:
+                settings.setdefault(*fact)
+            i += 1
+        return settings
+
+    @property
+    def modules(self):
+        if self._modules is None:
+            self._modules = []
+            if self.moduleStart is not None:
+                for s in self.lines[(self.moduleStart + 1):self.moduleEnd]:
+                    if '     ' in s:
+                        self._modules.append(s.split(': ', 1)[-1].strip())
+        return self._modules
+
+    @property
+    def videoResets(self):
+        if self._videoResets is None:
+            self._videoResets = [VideoReset(i, self._block(i + 1)) for i in searchIndices(VIDEO_RESET_MARKER, self.lines)]
+        return self._videoResets
+
+    @property
+    def encoders(self):
+        if self._encoders is None:
+            self._encoders = []
+            for i in searchIndices(ENCODER_MARKER, self.lines):
+                m = encoder_re.search(self.lines[i])
+                if m:
+                    self._encoders.append(Encoder(i, m.group('encoder'), m.group('name'), self._block(i + 1)))
+        return self._encoders
+
+    @property
+    def scenes(self):
+        if self._scenes is None:
+            self._scenes = self._parseScenes()
+        return self._scenes
+
+    def _parseScenes(self):
+        # Only located, no scene or source line is read
+        lines = self.lines
+        sceneLines = getScenes(lines)
+        if not sceneLines:
+            return []
+        last = sceneLines[-1]
+        ends = sceneLines[1:] + [getNextPos(last, getSections(lines)) or len(lines)]
+        return [Scene(line, end) for line, end in zip(sceneLines, ends)]
+
+    def sources(self, scene, kind):
+        """Lines of the sources of exactly this kind in the scene. Kinds of
+        SOURCE_KINDS are answered from the term index, others are scanned for."""
+        found = self._sources.get(kind)
+        if found is None:
+            found = self._sources[kind] = self._locateSources(kind)
+        return found.get(scene.line, [])
+
+    def _locateSources(self, kind):
+        # Scene line: lines of its sources of the kind, in one pass over the kind's lines
+        scenes = self.scenes
+        starts = [scene.line for scene in scenes]
+        sourceLines = set(searchIndices(SOURCE_MARKER, self.lines))
+        found = {}
+        for i in searchIndices(SOURCE_KIND_TERM.format(kind), self.lines):
+            n = bisect.bisect_left(starts, i) - 1
+            if n >= 0 and i < scenes[n].end and i in sourceLines:
+                found.setdefault(starts[n], []).append(i)
+        return found
+
+    @property
+    def timeline(self):
+        if self._timeline is None:
+            self._timeline = self._parseTimeline()
+        return self._timeline
+
+    def _parseTimeline(self):
+        # One pass over the statistics lines of all series, in log order, so
+        # that timestamps passing midnight can be told apart
+        lines = self.lines
+        timeline = {stat: Series(array.array('q'), array.array('d'), array.array('d')) for stat, _ in TIMELINE_STATS}
+        found = sorted((i, stat) for stat, term in TIMELINE_STATS for i in searchIndices(term, lines))
+        origin = clockSeconds(lines[0]) if len(lines) else None
+        last = day = 0
+        for i, stat in found:
+            s = lines[i]
+            if stat == 'buffering':
+                m = buffering_re.search(s)
+                if not m:
+                    continue
+                value = int(m.group(1))
+            elif stat == 'dropped' and 'test_stream' in s:
+                # Bandwidth tests of the auto-config wizard aren't sessions
+                continue
+            else:
+                value = percentIn(s)
+            t = clockSeconds(s)
+            if t is None:
+                t = last
+            else:
+                if origin is None:
+                    origin = t
+                t += day - origin
+                if t < last - 43200:
+                    day += 86400
+                    t += 86400
+            last = t
+            series = timeline[stat]
+            series.lines.append(i)
+            series.times.append(t)
+            series.values.append(value)
+        return timeline
+
+    def highest(self, stat):
+        """The highest value of a timeline statistic, 0 unless one is above it."""
+        return max(0, max(self.timeline[stat].values, default=0))
+
+    def duration(self, start, end):
+        """Seconds from line start to the last timestamped line up to line end. None without timestamps."""
+        first = clockSeconds(self.lines[start])
+        if first is None:
+            return None
+        for i in range(end, start, -1):
+            last = clockSeconds(self.lines[i])
+            if last is not None:
+                return round(last - first if last >= first else last - first + 86400, 3)
+        return None
+
+    @property
+    def sessions(self):
+        if self._sessions is None:
+            self._sessions = self._parseSessions()
+        return self._sessions
+
+    def _parseSessions(self):
+        lines = self.lines
+        spans = []
+        for kind, startMarker, stopMarker in SESSION_MARKERS:
+            starts = searchIndices(startMarker, lines)
+            stops = searchIndices(stopMarker, lines)
+            for n, start in enumerate(starts):
+                # Stopped if the next stop comes before the next start of the same type
+                nextStart = starts[n + 1] if n + 1 < len(starts) else len(lines)
+                stop = getNextPos(start, stops)
+                if stop is not None and stop > nextStart:
+                    stop = None
+                spans.append((start, kind, stop, nextStart))
+        spans.sort()
+        allStarts = [span[0] for span in spans]
+
+        sessions = []
+        encoders = self.encoders
+        current = {}  # encoder name: last Encoder before the session start
+        e = 0
+        for start, kind, stop, nextStart in spans:
+            end = nextStart if stop is None else getNextPos(stop, allStarts) or len(lines)
+            while e < len(encoders) and encoders[e].line < start:
+                current[encoders[e].name] = encoders[e]
+                e += 1
+            videoSettings = self.lastVideoReset(end=start)
+            duration = self.duration(start, end - 1 if stop is None else stop)
+            stats = {}
+            for stat, _ in TIMELINE_STATS:
+                series = self.timeline[stat]
+                values = series.values[bisect.bisect_left(series.lines, start):bisect.bisect_left(series.lines, end)]
+                stats[stat] = seriesStats(values, duration)
+            sessions.append(OutputSession(kind, start, stop, end, videoSettings.settings if videoSettings else None,
+                                          list(current.values()), duration, stats,
+                                          *(max(0, stats[stat].max or 0) for stat, _ in FRAME_STATS)))
+        return sessions
+
+    def text(self, i):
+        """Line i without its timestamp."""
+        return stripTimestamp(self.lines[i])
+
+    def lastVideoReset(self, end=None):
+        """The last VideoReset before line end, None if there is none."""
+        for reset in reversed(self.videoResets):
+            if end is None or reset.line < end:
+                return reset
+
+
+def parseLog(lines):
+    """The ParsedLog of the lines. It is built on first use and cached on
+    LogLines and indexed lines; plain lists are parsed on every call."""
+    parsed = getattr(lines, 'parsed', None)
+    if parsed is None:
+        parsed = ParsedLog(lines)
+        if hasattr(lines, 'parsed'):
+            lines.parsed = parsed
+    return parsed
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+
+def contentDigest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultStore():
+    """ On-disk store of analysis results, keyed by the hash of the log content.
+
+    Each entry holds the compressed log and its message list, stamped with the
+    analyzer version they were produced by. Entries of other versions are
+    dropped when the store is opened. Once the stored data grows past maxBytes,
+    the least recently used entries are deleted. The entry count and size are
+    kept as running totals, so neither needs a scan of the table. Safe to share
+    between threads.
+    """
+
+    def __init__(self, path, version, maxBytes=512 * 1024 * 1024):
+        self.version = version
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS results (
+                                   digest TEXT NOT NULL,
+                                   version TEXT NOT NULL,
+                                   log BLOB NOT NULL,
+                                   messages TEXT NOT NULL,
+                                   size INTEGER NOT NULL,
+                                   accessed REAL NOT NULL,
+                                   PRIMARY KEY (digest, version))""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self.db.execute("DELETE FROM results WHERE version != ?", (version,))
+            # The only full scan, totals are kept up to date from here on
+            self.count, self.bytes = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+
+    def get(self, digest):
+        """Returns the stored messages for the log with this content digest, or None."""
+        with self.lock, self.db:
+            row = self.db.execute("SELECT messages FROM results WHERE digest = ? AND version = ?",
+                                  (digest, self.version)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE results SET accessed = ? WHERE digest = ? AND version = ?",
+                            (time.time(), digest, self.version))
+        return json.loads(row[0])
+
+    def getLog(self, digest):
+        """Returns the stored log content, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT log FROM results WHERE digest = ? AND version = ?",
+                                  (digest, self.version)).fetchone()
+        return None if row is None else zlib.decompress(row[0])
+
+    def put(self, digest, data, messages):
+        log = zlib.compress(data)
+        messages = json.dumps(messages)
+        size = len(log) + len(messages)
+        with self.lock:
+            count, total = self.count, self.bytes
+            try:
+                with self.db:
+                    row = self.db.execute("SELECT size FROM results WHERE digest = ? AND version = ?",
+                                          (digest, self.version)).fetchone()
+                    self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                                    (digest, self.version, log, messages, size, time.time()))
+                    if row is None:
+                        self.count += 1
+                        self.bytes += size
+                    else:
+                        self.bytes += size - row[0]
+                    self._collect()
+            except BaseException:
+                # Rolled back, and so are the totals
+                self.count, self.bytes = count, total
+                raise
+
+    def _collect(self):
+        if self.bytes <= self.maxBytes:
+            return
+        # Oldest first, until the store is back under its cap. Rows are read
+        # through the index only as far as needed.
+        rows = self.db.execute("SELECT digest, version, size FROM results ORDER BY accessed")
+        expired = []
+        for digest, version, size in rows:
+            if self.bytes <= self.maxBytes:
+                break
+            expired.append((digest, version))
+            self.count -= 1
+            self.bytes -= size
+        rows.close()
+        self.db.executemany("DELETE FROM results WHERE digest = ? AND version = ?", expired)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": self.count, "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
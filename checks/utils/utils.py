@@ -1,60 +1,318 @@
+import array
+import bisect
+import functools
+import re
+
+from .loglines import LogLines
+
+
+# term scanning
+# --------------------------------------
+
+# Literal terms the checks search for. Each check module registers its terms
+# on import, so that the index built in doAnalysis can answer them from a
+# single pass over the log. Terms that are searched for but not registered
+# still work, they are just scanned for separately on first use.
+searchTerms = set()
+
+
+def registerTerms(*terms):
+    searchTerms.update(terms)
+
+
+def _buildTrie(terms):
+    root = {}
+    for term in terms:
+        node = root
+        for c in term:
+            node = node.setdefault(c, {})
+        node[''] = True
+    return root
+
+
+def _resumeOffset(term, terms):
+    # Offset into a match of `term` from which another term could start
+    for k in range(1, len(term)):
+        rest = term[k:]
+        if any(t.startswith(rest) or rest.startswith(t) for t in terms):
+            return k
+    return len(term)
+
+
+def _trieToPattern(node):
+    terminal = '' in node
+    alternatives = [re.escape(c) + _trieToPattern(child) for c, child in sorted(node.items()) if c != '']
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1:
+        pattern = alternatives[0]
+    else:
+        pattern = '(?:' + '|'.join(alternatives) + ')'
+    if terminal:
+        # Greedy, so the longest term starting at a position wins
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+@functools.lru_cache(maxsize=8)
+def _compileTerms(terms):
+    # for each term, the registered terms that are prefixes of it (itself included)
+    prefixes = {t: [p for p in terms if t.startswith(p)] for t in terms}
+    resume = {t: _resumeOffset(t, terms) for t in terms}
+    return re.compile(_trieToPattern(_buildTrie(terms))), prefixes, resume
+
+
+@functools.lru_cache(maxsize=8)
+def _compileBytesTerms(terms):
+    # The same pattern and tables for scanning UTF-8 buffers, keyed by encoded term
+    pattern, prefixes, resume = _compileTerms(terms)
+    return (re.compile(pattern.pattern.encode('utf-8')),
+            {t.encode('utf-8'): found for t, found in prefixes.items()},
+            {t.encode('utf-8'): len(t[:k].encode('utf-8')) for t, k in resume.items()})
+
+
+class TermIndex():
+    """ Term -> matching line numbers map, built in a single pass over the log.
+
+    The terms are compiled into one prefix-factored pattern (a trie, so the
+    regex engine walks it like an Aho-Corasick goto function). For every line,
+    each position where a term starts yields the longest term starting there;
+    all registered terms that are prefixes of it are matched implicitly, and
+    scanning resumes at the first offset where an overlapping term could start.
+    LogLines are scanned as one buffer, with matches mapped back to lines.
+    """
+
+    def __init__(self, lines, terms, hits=None):
+        self.lines = lines
+        self.hits = {}
+        self.lazyTerms = set()
+        if hits is not None:
+            # Already scanned elsewhere, e.g. in chunks by worker processes
+            self.hits = hits
+            return
+        terms = frozenset(t for t in terms if t)
+        if not terms:
+            return
+
+        if isinstance(lines, LogLines):
+            self.hits = self._scanBuffer(lines, terms)
+            return
+
+        pattern, prefixes, resume = _compileTerms(terms)
+        hits = {t: [] for t in terms}
+        find = pattern.search
+
+        for i, s in enumerate(lines):
+            m = find(s)
+            while m:
+                term = m.group()
+                for t in prefixes[term]:
+                    found = hits[t]
+                    if not found or found[-1] != i:
+                        found.append(i)
+                m = find(s, m.start() + resume[term])
+        self.hits = hits
+
+    @staticmethod
+    def _scanBuffer(lines, terms, hits=None, base=0):
+        # The same scan over the whole buffer at once; match offsets are mapped
+        # to line numbers by bisecting the line offsets. Hits are added to
+        # `hits` if given, with line numbers shifted by base.
+        pattern, prefixes, resume = _compileBytesTerms(terms)
+        if hits is None:
+            hits = {t: [] for t in terms}
+        find = pattern.search
+        buffer = lines.buffer
+        pos, limit = lines.byteRange()
+        lineAt = lines.lineAt
+
+        m = find(buffer, pos, limit)
+        while m:
+            term = m.group()
+            i = lineAt(m.start()) + base
+            for t in prefixes[term]:
+                found = hits[t]
+                if not found or found[-1] != i:
+                    found.append(i)
+            m = find(buffer, m.start() + resume[term], limit)
+        return hits
+
+    def lookup(self, term):
+        """Returns the (ascending) indices of the lines containing `term`."""
+        try:
+            return self.hits[term]
+        except KeyError:
+            if isinstance(self.lines, LogLines):
+                found = self.lines.findLines(term)
+            else:
+                found = [i for i, s in enumerate(self.lines) if term in s]
+            self.hits[term] = found
+            self.lazyTerms.add(term)
+            return found
+
+
+class IndexedLines(list):
+    """List of log lines carrying a TermIndex, which the search helpers answer from.
+    Slices and other derived lists are plain lists and get searched directly."""
+
+    def __init__(self, lines, terms=None, hits=None):
+        super().__init__(lines)
+        self.termIndex = TermIndex(self, searchTerms if terms is None else terms, hits)
+        self.parsed = None
+
+
+def indexLines(lines, terms=None, hits=None):
+    """Attaches a TermIndex to LogLines, or wraps a list of lines in IndexedLines."""
+    if isinstance(lines, LogLines):
+        if lines.termIndex is None or hits is not None:
+            lines.termIndex = TermIndex(lines, searchTerms if terms is None else terms, hits)
+        return lines
+    return IndexedLines(lines, terms, hits)
+
+
+class LogLinesBuilder():
+    """ Builds indexed LogLines from a log arriving in chunks, e.g. while it downloads.
+
+    Each fed chunk is split into lines and its complete lines are scanned for
+    the terms right away, so that once the last chunk arrives only the final
+    line is left to index.
+    """
+
+    def __init__(self, terms=None):
+        self.buffer = bytearray()
+        self.offsets = array.array('q', [0])
+        self.terms = frozenset(t for t in (searchTerms if terms is None else terms) if t)
+        self.hits = {t: [] for t in self.terms}
+        self.scanned = 0
+
+    def feed(self, chunk):
+        start = len(self.buffer)
+        self.buffer += chunk
+        find = self.buffer.find
+        pos = find(b'\n', start)
+        while pos >= 0:
+            self.offsets.append(pos + 1)
+            pos = find(b'\n', pos + 1)
+        self._scan()
+
+    def _scan(self):
+        # Lines that have their end offset are complete; matches never span lines
+        complete = len(self.offsets) - 1
+        if complete > self.scanned and self.terms:
+            TermIndex._scanBuffer(LogLines(self.buffer, self.offsets, self.scanned, complete), self.terms, self.hits, self.scanned)
+        self.scanned = complete
+
+    def finish(self):
+        """Returns the indexed LogLines. Nothing can be fed afterwards."""
+        self.offsets.append(len(self.buffer) + 1)
+        self._scan()
+        lines = LogLines(self.buffer, self.offsets)
+        lines.termIndex = TermIndex(lines, self.terms, self.hits)
+        return lines
+
+
+def _positions(term, lines, start=0, end=None):
+    # Ascending indices of the lines in [start, end) that contain term
+    end = len(lines) if end is None else min(end, len(lines))
+    termIndex = getattr(lines, 'termIndex', None)
+    if termIndex is not None:
+        found = termIndex.lookup(term)
+        if start <= 0 and end >= len(lines):
+            return found
+        return found[bisect.bisect_left(found, start):bisect.bisect_left(found, end)]
+    if isinstance(lines, LogLines):
+        return lines.findLines(term, start, end)
+    if start <= 0 and end >= len(lines):
+        return [i for i, s in enumerate(lines) if term in s]
+    return [i for i in range(start, end) if term in lines[i]]
+
+
+# patterns
+# --------------------------------------
+
+
+class LazyPattern():
+    """ Regex compiled on first use, so that importing a check module doesn't
+    compile the patterns of checks that never run. Used like the compiled
+    pattern: its methods are looked up once, then kept on the instance.
+    """
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+
+    def __getattr__(self, name):
+        # Only reached for attributes that aren't set yet
+        if name.startswith('__'):
+            raise AttributeError(name)
+        value = getattr(re.compile(self.pattern, self.flags), name)
+        setattr(self, name, value)
+        return value
+
+
+# structure
+# --------------------------------------
+
+# Boundaries of the log structure. They are registered like any other term, so
+# the term index holds a sorted array of their line numbers and the helpers
+# below answer from it instead of rescanning the log.
+SECTION_SEPARATOR = '------------------------------------------------'
+SUBSECTION_SEPARATOR = '---------------------------------'
+SCENE_MARKER = '- scene'
+MODULES_MARKER = 'Loaded Modules:'
+
+registerTerms(SECTION_SEPARATOR, SUBSECTION_SEPARATOR, SCENE_MARKER, MODULES_MARKER)
+
+
 # other functions
 # --------------------------------------
 
 
-def search(term, lines):
-    return [s for s in lines if term in s]
+# The optional start and end bounds restrict a search to lines[start:end]
+# without copying it. Returned indices are always absolute.
+
+
+def search(term, lines, start=0, end=None):
+    return [lines[i] for i in _positions(term, lines, start, end)]
+
+
+def searchExclude(term, lines, exclude, start=0, end=None):
+    return [s for s in search(term, lines, start, end) if not any(excludeTerm in s for excludeTerm in exclude)]
+
+
+def searchWithIndex(term, lines, start=0, end=None):
+    return [[lines[i], i] for i in _positions(term, lines, start, end)]
 
 
-def searchExclude(term, lines, exclude):
-    return [s for s in lines if term in s and not any(excludeTerm in s for excludeTerm in exclude)]
+def searchIndices(term, lines, start=0, end=None):
+    return list(_positions(term, lines, start, end))
 
 
-def searchWithIndex(term, lines):
-    return [[s, i] for i, s in enumerate(lines) if term in s]
+def containsTerm(term, lines):
+    return len(_positions(term, lines)) > 0
 
 
 def getSections(lines):
-    sectPos = []
-    for i, s in enumerate(lines):
-        if '------------------------------------------------' in s:
-            sectPos.append(i)
-    return sectPos
+    return list(_positions(SECTION_SEPARATOR, lines))
 
 
 def getSubSections(lines):
-    sectPos = []
-    for i, s in enumerate(lines):
-        if '---------------------------------' in s:
-            sectPos.append(i)
-    return sectPos
+    return list(_positions(SUBSECTION_SEPARATOR, lines))
 
 
 def getNextPos(old, lst):
-    for new in lst:
-        if (new > old):
-            return new
+    i = bisect.bisect_right(lst, old)
+    if i < len(lst):
+        return lst[i]
 
 
 def getScenes(lines):
-    scenePos = []
-    for i, s in enumerate(lines):
-        if '- scene' in s:
-            scenePos.append(i)
-    return scenePos
+    return list(_positions(SCENE_MARKER, lines))
 
 
 def getLoadedModules(lines):
-    loadedModulePos = []
-    for i, s in enumerate(lines):
-        if 'Loaded Modules:' in s:
-            loadedModulePos.append(i)
-    return loadedModulePos
+    return list(_positions(MODULES_MARKER, lines))
 
 
 def getPluginEnd(lines):
-    loadedModules = getLoadedModules(lines)
-    subSections = getSubSections(lines)
-    for i, s in enumerate(lines):
-        if (subSections[i] > loadedModules[0]):
-            return subSections[i]
+    return getNextPos(getLoadedModules(lines)[0], getSubSections(lines))
@@ -1,8 +1,10 @@
 import datetime
 import re
 
+from .utils import LazyPattern
 
-winver_re = re.compile(r"""
+
+winver_re = LazyPattern(r"""
     (?i)
     Windows\sVersion: \s+ (?P<version>[0-9.]+)
     \s+
@@ -15,4 +15,9 @@ LEVEL_WARNING = 2
 LEVEL_CRITICAL = 3
 LEVEL_NONE = 4
 
+# Titles of the LEVEL_NONE messages carrying the per-session results and the
+# downsampled timeline
+SESSIONS_TITLE = "Output Sessions"
+TIMELINE_TITLE = "Timeline"
+
 cleanLog = "<br>To make a clean log file, please follow these steps: <br><br>1) Restart OBS. <br>2) Start your stream/recording for about 30 seconds. Make sure you replicate any issues as best you can, which means having any games/apps open and captured, etc. <br>3) Stop your stream/recording. <br>4) Select Help > Log Files > Upload Current Log File. Send that link via this troubleshooting tool or whichever support chat you are using."
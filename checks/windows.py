@@ -7,6 +7,29 @@ from .graphics import *
 from .utils.windowsversions import *
 
 
+registerTerms(
+    'Adapter 0',
+    'Adapter 1',
+    'Adapter 2',
+    'Loading up D3D11',
+    'refresh=',
+    ' Hz] initialized',
+    'samples per sec: ',
+    'Microsoft Basic Render Driver',
+    'Warning: The OpenGL renderer is currently in use.',
+    'Game DVR Background Recording: On',
+    'Game Mode: On',
+    'Game Mode: Off',
+    'Hardware GPU Scheduler: On',
+    'Hardware GPU Scheduler: Probably On',
+    'Hardware-Accelerated GPU Scheduling enabled on adapter!',
+    'Windows Version',
+    'Windows Version:',
+    'Running as administrator',
+    'could not open process:',
+    'Windows ARM64: Running with x64 emulation')
+
+
 def checkGPU(lines):
     def getAdapterName(adapterString):
         return adapterString.split(': ')[-1].strip()
@@ -34,7 +57,7 @@ def checkGPU(lines):
                     "OBS is running on an Intel iGPU. This hardware is generally not powerful enough to be used for both gaming and running obs. Situations where only sources from e.g. cameras and capture cards are used might work."]
 
 
-refresh_re = re.compile(r"""
+refresh_re = LazyPattern(r"""
     (?i)
     output \s+ (?P<output_num>[0-9]+):
     .*
@@ -110,7 +133,7 @@ def checkRefreshes(lines):
     return
 
 
-samples_re = re.compile(r"""
+samples_re = LazyPattern(r"""
     (?i)
     samples \sper \ssec:
     \s*
@@ -118,7 +141,7 @@ samples_re = re.compile(r"""
 """, re.VERBOSE)
 
 
-sample_re = re.compile(r"""
+sample_re = LazyPattern(r"""
     (?i)
     WASAPI:
     .*
@@ -231,14 +254,6 @@ def checkWin10Hags(lines):
                 hagsMessage]
 
 
-def check940(lines):
-    gpu = search('NVIDIA GeForce 940', lines)
-    attempt = search('NVENC encoder', lines)
-    if (len(gpu) > 0) and (len(attempt) > 0):
-        return [LEVEL_CRITICAL, "NVENC Not Supported",
-                """The NVENC Encoder is not supported on the NVIDIA 940 and 940MX. Recording fails to start because of this. Please select "Software (x264)" or "Hardware (QSV)" as encoder instead in Settings > Output."""]
-
-
 # Log line examples:
 # win 7: 19:39:17.395: Windows Version: 6.1 Build 7601 (revision: 24535; 64-bit)
 # win 10: 15:30:58.866: Windows Version: 10.0 Build 19041 (release: 2004; revision: 450; 64-bit)
@@ -343,14 +358,14 @@ def checkAdmin(lines):
                 "OBS is not running as Administrator. This can lead to OBS not being able to Game Capture certain games. If you are not running into issues, you can ignore this."]
 
 
-gc_admin_re = re.compile(r"could not open process: (?P<executable>.*)$")
+gc_admin_re = LazyPattern(r"could not open process: (?P<executable>.*)$")
 
 
 def checkGCAdmin(lines):
     error_lines = search("could not open process:", lines)
     gc_error_lines = search("game-capture", error_lines)           # Makes sure the error comes from a game capture, in case.
     if gc_error_lines:
-        exe_list = set([gc_admin_re.search(line).group("executable").strip() for line in gc_error_lines])
+        exe_list = dict.fromkeys(gc_admin_re.search(line).group("executable").strip() for line in gc_error_lines)
         return [LEVEL_INFO, "Game Capture Permissions",
                 "Game Capture was unable to capture the following applications. This may be solved by running OBS as an Administrator:<br>\n<ul>\n<li>"
                 + "</li>\n<li>".join(exe_list)
@@ -1,23 +1,31 @@
 #!/usr/bin/env python3
 
 import argparse
+import collections
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
 import textwrap
+import time
 
 from checks.vars import *
+# The other check modules are imported by loadChecks, for the platform of the log
 from checks.core import *
-from checks.audio import *
 from checks.encoding import *
 from checks.graphics import *
-from checks.macos import *
-from checks.network import *
-from checks.plugins import *
 from checks.sources import *
-from checks.linux import *
-from checks.windows import *
+from checks.registry import *
+from checks import parallel
+from checks.parallel import ParallelAnalysis, logSize, useParallel
 
 from checks.utils.fetchers import *
+from checks.utils import metrics
+from checks.utils.store import ResultStore, contentDigest
+from checks.utils.parsedlog import sniffOperatingSystem
 from checks.utils.utils import *
-from checks.utils.windowsversions import *
 
 
 # main functions
@@ -76,133 +84,101 @@ def getResults(messages):
     return results
 
 
-def doAnalysis(url=None, filename=None):
-    messages = []
-    success = False
-    logLines = []
-
+def getLog(url=None, filename=None):
+    """Fetches a log. Returns its lines and description message, or (None, None)
+    if the URL or file doesn't contain a log."""
     if url is not None:
-        gist = matchGist(url)
-        haste = matchHaste(url)
-        obs = matchObs(url)
-        pastebin = matchPastebin(url)
-        discord = matchDiscord(url)
-        if (gist):
-            gistObject = getGist(gist.groups()[-1])
-            logLines = getLinesGist(gistObject)
-            messages.append(getDescriptionGist(gistObject))
-            success = True
-        elif (haste):
-            hasteObject = getHaste(haste.groups()[-1])
-            logLines = getLinesHaste(hasteObject)
-            messages.append(getDescription(logLines))
-            success = True
-        elif (obs):
-            obslogObject = getObslog(obs['obsLogURLRoot'], obs['obsLogURLFilename'])
-            logLines = getLinesObslog(obslogObject)
-            messages.append(getDescription(logLines))
-            success = True
-        elif (pastebin):
-            pasteObject = getRawPaste(pastebin.groups()[-1])
-            logLines = getLinesPaste(pasteObject)
-            messages.append(getDescription(logLines))
-            success = True
-        elif (discord):
-            attachment = discord.groups()[-1]
-            if attachment == "message":
-                attachment = discord.groups()[-2]
-            pasteObject = getRawDiscord(attachment)
-            if len(pasteObject) > 0:
-                logLines = getLinesDiscord(pasteObject)
-                messages.append(getDescription(logLines))
-                success = True
+        target = classifyUrl(url)
+        if target is not None:
+            return getProviderLog(*target)
 
     elif filename is not None:
         logLines = getLinesLocal(filename)
-        messages.append(getDescription(logLines))
-        success = True
-
-    if (success):
-        classic, m = checkClassic(logLines)
-        crash, m = checkCrash(logLines)
-        messages.append(m)
-        if (not classic and not crash):
-            messages.extend([
-                checkObsVersion(logLines),
-                checkDual(logLines),
-                checkAutoconfig(logLines),
-                checkCPU(logLines),
-                checkAMDdrivers(logLines),
-                checkNVIDIAdrivers(logLines),
-                checkGPU(logLines),
-                checkRefreshes(logLines),
-                checkInit(logLines),
-                checkWayland(logLines),
-                checkNVIDIAdriversEGL(logLines),
-                checkNVENC(logLines),
-                check940(logLines),
-                checkKiller(logLines),
-                checkWifi(logLines),
-                checkBind(logLines),
-                checkWindowsVer(logLines),
-                checkWindowsARM64(logLines),
-                checkMacVer(logLines),
-                checkAdmin(logLines),
-                checkGCAdmin(logLines),
-                checkImports(logLines),
-                check32bitOn64bit(logLines),
-                checkWindowsARM64EmulationStatus(logLines),
-                checkRosettaTranslationStatus(logLines),
-                checkAttempt(logLines),
-                checkMP4(logLines),
-                checkPreset(logLines),
-                checkCustom(logLines),
-                checkBrowserAccel(logLines),
-                checkAudioBuffering(logLines),
-                checkDrop(logLines),
-                checkRenderLag(logLines),
-                checkEncodeError(logLines),
-                checkEncoding(logLines),
-                checkMulti(logLines),
-                checkStreamSettings(logLines),
-                checkMicrosoftSoftwareGPU(logLines),
-                checkWasapiSamples(logLines),
-                checkOpenGLonWindows(logLines),
-                checkGameDVR(logLines),
-                checkGameMode(logLines),
-                checkWin10Hags(logLines),
-                checkNICSpeed(logLines),
-                checkDynamicBitrate(logLines),
-                checkNetworkOptimizations(logLines),
-                checkTCPPacing(logLines),
-                checkStreamDelay(logLines),
-                checkUnknownEncoder(logLines),
-                checkBrowserSource(logLines),
-                checkMonitoringDevice(logLines),
-                checkPluginList(logLines),
-                checkVantage(logLines),
-                checkPortableMode(logLines),
-                checkSafeMode(logLines),
-                checkSnapPackage(logLines),
-                checkX11Captures(logLines),
-                checkMissingModules(logLines),
-                checkLinuxVCam(logLines),
-                checkMacPermissions(logLines),
-                checkServiceRecommendations(logLines),
-                checkLinuxSystemInfo(logLines),
-                checkLLVMpipe(logLines)
-            ])
-            messages.extend(checkVideoSettings(logLines))
-            m = parseScenes(logLines)
-            # TODO Verify .extend() can be used for parseScenes
-            seenMessages = set()
-            for sublist in m:
-                if sublist is not None:
-                    for item in sublist:
-                        itemTuple = tuple(item)
-                        if itemTuple not in seenMessages:
-                            messages.append(item)
-                            seenMessages.add(itemTuple)
+        return logLines, getDescription(logLines)
+
+    return None, None
+
+
+def analyzeLog(logLines):
+    """Runs every applicable check on the log lines and returns their messages.
+    Large logs are analyzed by a process pool if parallel analysis is enabled."""
+    loadChecks(sniffOperatingSystem(logLines))
+    if useParallel(logLines):
+        with ParallelAnalysis(logLines) as analysis:
+            return runAnalysis(analysis.lines, analysis.runChecks)
+    return runAnalysis(indexLines(logLines), runChecks)
+
+
+def runAnalysis(logLines, run):
+    messages = []
+    classic, m = checkClassic(logLines)
+    crash, m = checkCrash(logLines)
+    messages.append(m)
+    if (not classic and not crash):
+        messages.extend(run(logLines, selectChecks(logLines)))
+        messages.extend(checkVideoSettings(logLines))
+        m = parseScenes(logLines)
+        # TODO Verify .extend() can be used for parseScenes
+        seenMessages = set()
+        for sublist in m:
+            if sublist is not None:
+                for item in sublist:
+                    itemTuple = tuple(item)
+                    if itemTuple not in seenMessages:
+                        messages.append(item)
+                        seenMessages.add(itemTuple)
+        messages.append(getOutputSessions(logLines))
+        messages.append(getTimeline(logLines))
+    return messages
+
+
+def getAnalyzerVersion():
+    """Stamp for stored results. Changes with CURRENT_VERSION, the registered checks and the analyzer code."""
+    stamp = hashlib.sha256(CURRENT_VERSION.encode('utf-8'))
+    stamp.update(" ".join(check.name for check in checkRegistry).encode('utf-8'))
+    root = os.path.dirname(os.path.abspath(__file__))
+    for path in [os.path.join(root, 'loganalyzer.py')] + sorted(glob.glob(os.path.join(root, 'checks', '**', '*.py'), recursive=True)):
+        with open(path, "rb") as f:
+            stamp.update(f.read())
+    return stamp.hexdigest()
+
+
+def analyzeStored(logLines, store):
+    """Like analyzeLog, but logs whose content is already in the result store aren't analyzed again."""
+    data = logLines.toBytes() if isinstance(logLines, LogLines) else '\n'.join(logLines).encode('utf-8')
+    digest = contentDigest(data)
+    messages = store.get(digest)
+    if messages is None:
+        messages = [m for m in analyzeLog(logLines) if m is not None]
+        store.put(digest, data, messages)
+    return messages
+
+
+analysisSeconds = metrics.Histogram('loganalyzer_analysis_seconds', 'Time to analyze a fetched log.', metrics.LATENCY_BUCKETS)
+logBytes = metrics.Histogram('loganalyzer_log_bytes', 'Size of the analyzed logs.', metrics.SIZE_BUCKETS)
+
+
+def doAnalysis(url=None, filename=None, store=None):
+    try:
+        logLines, description = getLog(url=url, filename=filename)
+    except FetchError as e:
+        return [[LEVEL_CRITICAL, "NO LOG", "URL or file doesn't contain a log ({}).".format(e)]]
+    return analyzeFetched(logLines, description, store)
+
+
+def analyzeFetched(logLines, description, store=None):
+    """Returns the messages for a fetched log, starting with its description.
+    logLines is None if nothing was fetched."""
+    messages = []
+    if logLines is not None:
+        start = time.perf_counter()
+        messages.append(description)
+        if store is not None:
+            messages.extend(analyzeStored(logLines, store))
+        else:
+            messages.extend(analyzeLog(logLines))
+        analysisSeconds.observe(time.perf_counter() - start)
+        logBytes.observe(logSize(logLines))
     else:
         messages.append([LEVEL_CRITICAL, "NO LOG",
                          "URL or file doesn't contain a log."])
@@ -212,6 +188,182 @@ def doAnalysis(url=None, filename=None):
     return (ret)
 
 
+def listChecks(logLines=None):
+    """Prints the registered checks, and which of them apply to the given log."""
+    selected = None
+    if logLines is not None:
+        loadChecks(sniffOperatingSystem(logLines))
+        selected = set(check.name for check in selectChecks(indexLines(logLines)))
+    for check in checkRegistry:
+        state = ""
+        if selected is not None:
+            state = "run " if check.name in selected else "skip"
+        print("{:4} {:36} {:8} {}".format(state, check.name, "/".join(check.platforms or ("any",)),
+                                          ", ".join(check.triggers or ("(always)",))))
+    if selected is not None:
+        print("\n{} of {} checks apply to this log.".format(len(selected), len(checkRegistry)))
+
+
+def expandInputs(paths, manifest=None):
+    """Expands files, directories (recursively) and glob patterns into log files,
+    followed by the files listed in the manifest, one per line."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, name) for name in sorted(files))
+        elif glob.has_magic(path):
+            found.extend(p for p in sorted(glob.glob(path, recursive=True)) if os.path.isfile(p))
+        else:
+            found.append(path)
+    if manifest is not None:
+        with open(manifest, "r") as f:
+            found.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    return list(dict.fromkeys(found))
+
+
+def readBatchOutput(output):
+    """Returns the inputs already recorded in a JSONL output file. A record cut
+    short by an interrupted run is truncated away, so the file can be appended to."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            done.add(json.loads(line)['input'])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return done
+
+
+def analyzeFile(filename):
+    """Analyzes one local log and returns its batch record."""
+    record = {'input': filename}
+    try:
+        record['bytes'] = os.path.getsize(filename)
+        start = time.perf_counter()
+        logLines, _ = getLog(filename=filename)
+        read = time.perf_counter()
+        if logLines is None:
+            record['error'] = "file doesn't contain a log"
+            return record
+        messages = [m for m in analyzeLog(logLines) if m is not None]
+        done = time.perf_counter()
+    except Exception as e:
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+        return record
+    record['lines'] = len(logLines)
+    record['timings'] = {'read': round(read - start, 6), 'analysis': round(done - read, 6)}
+    for level, name in ((LEVEL_CRITICAL, 'critical'), (LEVEL_WARNING, 'warning'), (LEVEL_INFO, 'info')):
+        record[name] = [m[1] for m in messages if m[0] == level]
+    record['sessions'] = next((m[2] for m in messages if m[0] == LEVEL_NONE and m[1] == SESSIONS_TITLE), [])
+    return record
+
+
+def runBatch(inputs, output, workers=1):
+    """Analyzes the inputs across a pool of worker processes, appending one JSON
+    record per log to output. Inputs already recorded there are skipped."""
+    done = readBatchOutput(output)
+    todo = [filename for filename in inputs if filename not in done]
+    print("{} logs, {} already done, {} to analyze".format(len(inputs), len(inputs) - len(todo), len(todo)), file=sys.stderr)
+
+    count = 0
+    errors = 0
+    size = 0
+    start = time.perf_counter()
+    with open(output, "a") as f, multiprocessing.Pool(max(workers, 1)) as pool:
+        for record in pool.imap_unordered(analyzeFile, todo, chunksize=4):
+            # Flushed per record, an interrupted run resumes from the last one
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            count += 1
+            errors += 'error' in record
+            size += record.get('bytes', 0)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print("{} logs ({} errors), {:.1f} MB in {:.2f}s: {:.1f} logs/s, {:.2f} MB/s".format(
+        count, errors, size / 1024 / 1024, elapsed, count / elapsed, size / 1024 / 1024 / elapsed), file=sys.stderr)
+
+
+def countLineReads(logLines):
+    """Analyzes the log once, counting the lines each function reads from it.
+    Returns a Counter keyed like pstats: (filename, first line, name)."""
+    counts = collections.Counter()
+    read = LogLines._line
+    ownFile = read.__code__.co_filename
+
+    def countingRead(self, i):
+        frame = sys._getframe(1)
+        # Comprehensions count towards the function they are in
+        while frame.f_code.co_filename == ownFile or frame.f_code.co_name.startswith('<'):
+            frame = frame.f_back
+        code = frame.f_code
+        counts[(code.co_filename, code.co_firstlineno, code.co_name)] += 1
+        return read(self, i)
+
+    LogLines._line = countingRead
+    try:
+        analyzeLog(LogLines(logLines.buffer, logLines.offsets, logLines.start, logLines.stop))
+    finally:
+        LogLines._line = read
+    return counts
+
+
+def profileAnalysis(url=None, filename=None, repeat=1):
+    """Profiles the analysis of a log, which is fetched once and analyzed repeat
+    times in this process. Returns the profile of the checks and helpers of the
+    analyzer, per run: calls, wall time including and excluding callees, and
+    lines read from the log."""
+    # Only needed here, not imported by every CLI run and worker
+    import cProfile
+    import pstats
+
+    start = time.perf_counter()
+    logLines, _ = getLog(url=url, filename=filename)
+    fetched = time.perf_counter() - start
+    if logLines is None:
+        return None
+    if not isinstance(logLines, LogLines):
+        logLines = LogLines.fromLines(logLines)
+    lineReads = countLineReads(logLines)
+
+    profiler = cProfile.Profile()
+    elapsed = 0
+    for _ in range(repeat):
+        # A fresh view each run, so no run reuses the term index of the previous one
+        lines = LogLines(logLines.buffer, logLines.offsets, logLines.start, logLines.stop)
+        start = time.perf_counter()
+        profiler.runcall(analyzeLog, lines)
+        elapsed += time.perf_counter() - start
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    functions = []
+    for key, (_, calls, own, total, _) in pstats.Stats(profiler).stats.items():
+        path, line, name = key
+        # Only the analyzer's own code, no built-ins or library functions
+        if not os.path.isabs(path) or not path.startswith(root + os.sep):
+            continue
+        functions.append({'function': '{}:{}'.format(os.path.relpath(path, root), name), 'line': line,
+                          'calls': calls / repeat, 'seconds': total / repeat, 'ownSeconds': own / repeat,
+                          'lines': lineReads.get(key, 0)})
+    functions.sort(key=lambda f: (-f['seconds'], f['function']))
+    return {'input': url or filename, 'repeat': repeat, 'lines': len(logLines), 'fetch': fetched,
+            'analysis': elapsed / repeat, 'functions': functions}
+
+
+def printProfile(profile):
+    print("{} lines, fetched in {:.3f}s, analyzed in {:.3f}s (mean of {} runs, profiling included)\n".format(
+        profile['lines'], profile['fetch'], profile['analysis'], profile['repeat']))
+    print("{:>10} {:>10} {:>10} {:>10}  {}".format("total (s)", "own (s)", "calls", "lines read", "function"))
+    for f in profile['functions']:
+        print("{:>10.4f} {:>10.4f} {:>10g} {:>10} {}".format(f['seconds'], f['ownSeconds'], f['calls'], f['lines'], f['function']))
+
+
 def main():
     parser = argparse.ArgumentParser()
     loggroup = parser.add_mutually_exclusive_group(required=True)
@@ -220,8 +372,52 @@ def main():
                           default=None, help="url of gist or haste with log")
     loggroup.add_argument("--file", "-f", dest='file',
                           default=None, help="local filenamne with log")
+    loggroup.add_argument("--batch", "-b", dest='batch', nargs='+', default=None,
+                          help="analyze many local logs: files, directories or glob patterns")
+    loggroup.add_argument("--manifest", dest='manifest', default=None,
+                          help="analyze the local logs listed in this file, one per line")
+    parser.add_argument("--output", "-o", dest='output', default="results.jsonl",
+                        help="JSONL file the batch records are appended to (default %(default)s)")
+    parser.add_argument("--list-checks", dest='listChecks', action='store_true',
+                        help="list the registered checks and which of them apply to the log")
+    parser.add_argument("--workers", "-w", dest='workers', default=1, type=int,
+                        help="number of worker processes, for large logs or for batches (default 1)")
+    parser.add_argument("--parallel-threshold", dest='parallelThreshold', default=None, type=int,
+                        help="log size in MB from which the workers are used (default: never, logs are analyzed sequentially)")
+    parser.add_argument("--profile", dest='profile', action='store_true',
+                        help="time the checks and helpers instead of printing the analysis (in one process)")
+    parser.add_argument("--profile-json", dest='profileJson', default=None,
+                        help="with --profile, also write the profile to this JSON file")
+    parser.add_argument("--repeat", "-r", dest='repeat', default=1, type=int,
+                        help="with --profile, analyze the log this many times and report the mean (default 1)")
     flags = parser.parse_args()
 
+    if flags.batch is not None or flags.manifest is not None:
+        # The workers each analyze whole logs, without a pool of their own
+        runBatch(expandInputs(flags.batch or [], flags.manifest), flags.output, flags.workers)
+        return
+
+    parallel.parallelWorkers = flags.workers
+    if flags.parallelThreshold is not None:
+        parallel.parallelThreshold = flags.parallelThreshold * 1024 * 1024
+
+    if flags.listChecks:
+        logLines, _ = getLog(url=flags.url, filename=flags.file)
+        listChecks(logLines)
+        return
+
+    if flags.profile:
+        parallel.parallelWorkers = 1
+        profile = profileAnalysis(url=flags.url, filename=flags.file, repeat=max(flags.repeat, 1))
+        if profile is None:
+            print("URL or file doesn't contain a log.")
+            return
+        printProfile(profile)
+        if flags.profileJson is not None:
+            with open(flags.profileJson, "w") as f:
+                json.dump(profile, f, indent=2)
+        return
+
     msgs = doAnalysis(url=flags.url, filename=flags.file)
     print(getSummary(msgs))
     print(getResults(msgs))
@@ -4,8 +4,26 @@ import logging
 import argparse
 import concurrent.futures
 import asyncio
+import collections
+import functools
+import gzip
+import hashlib
+import json
+import string
+import threading
+import time
 from aiohttp import web
 import loganalyzer as analyze
+from checks.utils import asyncfetchers, fetchers, metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # optional, responses are gzipped only
+
+# Logs of every platform are served, and downloads are indexed before the
+# platform is known, so all the checks and their terms are loaded up front
+analyze.loadChecks()
 
 with open("templates/index.html", "r") as f:  # Grab main HTML page
     htmlTemplate = f.read()
@@ -13,106 +31,310 @@ with open("templates/index.html", "r") as f:  # Grab main HTML page
 with open("templates/detail.html", "r") as f:  # Grab details page
     htmlDetail = f.read()
 
+with open("templates/timeline.html", "r") as f:  # Grab timeline card
+    htmlTimeline = f.read()
+
+# Summary entry linking to a detail
+htmlButton = """<p><a href="#{title}"><button type="button" class="btn btn-{sev}">{title}</button></a></p>\n"""
+
+# One line chart of the timeline card
+htmlChart = """<p class="card-text mb-1">{label} <small class="text-muted">up to {peak}{unit}</small></p>
+<svg class="mb-3" width="100%" height="48" viewBox="0 0 600 48" preserveAspectRatio="none">\
+<polyline fill="none" stroke="{color}" stroke-width="2" vector-effect="non-scaling-stroke" points="{points}"/></svg>
+"""
+
+# Part of every ETag, so pages rendered by another version of the server or templates don't match
+with open(__file__, "rb") as f:
+    renderStamp = hashlib.sha256(f.read() + htmlTemplate.encode('utf-8') + htmlDetail.encode('utf-8')
+                                 + htmlTimeline.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache():
+    """Bounded LRU cache of analysis results by log URL, with a TTL. Thread safe."""
+
+    def __init__(self, maxEntries=256, ttl=3600):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxEntries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hitRate": self.hits / total if total else 0.0}
+
+
+class SingleFlight():
+    """Runs one task per key at a time: callers for a key that is already in flight
+    wait for that task's result instead of starting their own. Event loop only."""
+
+    def __init__(self):
+        self.inflight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, factory):
+        task = self.inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(factory())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded, so a client going away doesn't cancel the work for the others
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"inflight": len(self.inflight), "started": self.started, "coalesced": self.coalesced}
+
+
+# The messages of an analysis, with a digest of them that the ETags of its
+# responses are derived from, so it is computed once per analysis rather than
+# for every response
+Analysis = collections.namedtuple('Analysis', 'msgs, tag')
+
+
+def analysisOf(msgs):
+    return Analysis(msgs, hashlib.sha256(json.dumps(msgs).encode('utf-8')).hexdigest())
+
+
+analysisCache = AnalysisCache()
+analysisFlights = SingleFlight()
+resultStore = None  # on-disk ResultStore, if enabled with --store
+threadPool = None  # executor for the analyses, created on startup
+
+
+def analyzePayload(payload, parse):
+    """Runs in the thread pool: builds the lines from a downloaded log and analyzes them.
+    Returns the Analysis."""
+    logLines, description = (None, None) if parse is None else parse(payload)
+    return analysisOf(analyze.analyzeFetched(logLines, description, resultStore))
+
+
+async def getAnalysis(session, url, target):
+    """Returns the Analysis of the log at url, from the cache if it was analyzed recently.
+    target is the (provider, log ID) checkUrl classified the URL as. The log is
+    downloaded on the event loop, only the analysis runs in the thread pool."""
+    # Keyed by log rather than URL, so all spellings of a link share one entry
+    key = fetchers.canonicalKey(*target)
+    fetchers.keyStats.record(target[0], key, url)
+    analysis = analysisCache.get(key)
+    if analysis is not None:
+        logging.info('Analysis cache hit: {} | {}'.format(key, analysisCache.stats()))
+        return analysis
+    # Failures have their own key: an analysis holds for every spelling of a
+    # link, but a failure can be down to the link itself (e.g. an expired
+    # signature), and mustn't be served for a working spelling of the log
+    failureKey = fetchers.negativeCache.key(*target)
+    reason = fetchers.negativeCache.get(failureKey)
+    if reason is not None:
+        logging.info('Negative cache hit: {} ({}) | {}'.format(failureKey, reason, fetchers.negativeCache.stats()))
+        return noLog(reason)
+    # Concurrent requests for the same log share one fetch and analysis
+    return await analysisFlights.run(key, lambda: fetchAndAnalyze(session, target, key, failureKey))
+
+
+def noLog(reason):
+    return analysisOf([[analyze.LEVEL_CRITICAL, "NO LOG", "URL or file doesn't contain a log ({}).".format(reason)]])
+
+
+async def fetchAndAnalyze(session, target, key, failureKey):
+    start = time.perf_counter()
+    try:
+        payload, parse = await asyncfetchers.fetchLog(session, *target)
+    except fetchers.FetchError as e:
+        # Dead links and timeouts are retried once the negative cache entry expires
+        fetchers.negativeCache.put(failureKey, str(e))
+        logging.info('Fetch failed: {} ({}) | {}'.format(failureKey, e, fetchers.negativeCache.stats()))
+        return noLog(e)
+    finally:
+        fetchSeconds.observe(time.perf_counter() - start, target[0].name)
+    analysis = await asyncio.get_running_loop().run_in_executor(None, analyzePayload, payload, parse)
+    if any(i[1] == "NO LOG" for i in analysis.msgs):
+        fetchers.negativeCache.put(failureKey, "not an OBS log")
+    else:
+        analysisCache.put(key, analysis)
+    logging.info('Analysis cache miss: {} | {} | {}'.format(key, analysisCache.stats(), analysisFlights.stats()))
+    logging.info('Collapsed URL spellings: {}'.format(fetchers.keyStats.stats()))
+    logging.info('Fetch client: {}'.format(asyncfetchers.fetchStats()))
+    if resultStore is not None:
+        logging.info('Result store: {}'.format(resultStore.stats()))
+    return analysis
+
 
 def checkUrl(url):
-    """Check if the incoming URL can be analyzed"""
-    return any((analyze.matchGist(url), analyze.matchHaste(url), analyze.matchObs(url), analyze.matchPastebin(url), analyze.matchDiscord(url)))
+    """Check if the incoming URL can be analyzed. Returns (provider, log ID) or None."""
+    return fetchers.classifyUrl(url)
 
 
-def getSummaryHTML(messages):
-    """Helper func. Generates the summary secion of the HTML page."""
-    critical = ""
-    warning = ""
-    info = ""
-    for i in messages:
-        if (i[0] == 3):
-            critical = critical + """<p><a href="#""" + \
-                i[1] + """"><button type="button" class="btn btn-danger">""" + \
-                i[1] + "</button></a></p>\n"
-        elif (i[0] == 2):
-            warning = warning + """<p><a href="#""" + \
-                i[1] + """"><button type="button" class="btn btn-warning">""" + \
-                i[1] + "</button></a></p>\n"
-        elif (i[0] == 1):
-            info = info + """<p><a href="#""" + \
-                i[1] + """"><button type="button" class="btn btn-info">""" + \
-                i[1] + "</button></a></p>\n"
-    if (len(critical) == 0):
-        critical = "No critical issues."
-    if (len(warning) == 0):
-        warning = "No warnings."
-    if (len(info) == 0):
-        info = "-"
-    return critical, warning, info
-
-
-def getDetailsHTML(messages):
-    """Helper func. Generates detailes section of the HTML page."""
-    res = ""
-    for i in messages:
-        if (i[0] == 3):
-            res = res + htmlDetail.format(anchor=i[1],
-                                          sev='danger',
-                                          severity='Critical',
-                                          title=i[1],
-                                          text=i[2])
-    for i in messages:
-        if (i[0] == 2):
-            res = res + htmlDetail.format(anchor=i[1],
-                                          sev='warning',
-                                          severity='Warning',
-                                          title=i[1],
-                                          text=i[2])
+def compileTemplate(template, **fixed):
+    """Splits a str.format template into literal text and field names, alternating
+    and starting with text, so it can be rendered with one join. Fields given in
+    fixed are filled in ahead of time."""
+    parts = []
+    literal = []
+    for text, field, _, _ in string.Formatter().parse(template):
+        literal.append(text)
+        if field is None:
+            continue
+        if field in fixed:
+            literal.append(str(fixed[field]))
+        else:
+            parts.append(''.join(literal))
+            parts.append(field)
+            literal = []
+    parts.append(''.join(literal))
+    return parts
+
+
+def renderTemplate(parts, values, out):
+    """Appends a compiled template to out, taking each field from values[field]."""
+    out.append(parts[0])
+    for k in range(1, len(parts), 2):
+        out.append(str(values[parts[k]]))
+        out.append(parts[k + 1])
+
+
+# Reporting order: level, css class, label
+SEVERITIES = ((analyze.LEVEL_CRITICAL, 'danger', 'Critical'),
+              (analyze.LEVEL_WARNING, 'warning', 'Warning'),
+              (analyze.LEVEL_INFO, 'info', 'Info'))
+
+# Per severity, with the fields taken straight from the message
+_messageFields = {'anchor': 1, 'title': 1, 'text': 2}
+_noneFound = {analyze.LEVEL_CRITICAL: "No critical issues.", analyze.LEVEL_WARNING: "No warnings.", analyze.LEVEL_INFO: "-"}
+_pageParts = compileTemplate(htmlTemplate)
+_detailParts = {}
+_buttonParts = {}
+for level, sev, severity in SEVERITIES:
+    _detailParts[level] = [_messageFields.get(p, p) if k % 2 else p
+                           for k, p in enumerate(compileTemplate(htmlDetail, sev=sev, severity=severity))]
+    _buttonParts[level] = [_messageFields.get(p, p) if k % 2 else p
+                           for k, p in enumerate(compileTemplate(htmlButton, sev=sev))]
+
+
+def dataMessage(messages, title):
+    """The data of the LEVEL_NONE message with title (see SESSIONS_TITLE), None if there is none."""
     for i in messages:
-        if (i[0] == 1):
-            res = res + htmlDetail.format(anchor=i[1],
-                                          sev='info',
-                                          severity='Info',
-                                          title=i[1],
-                                          text=i[2])
-    return res
-
-
-def getDescr(messages):
-    """Helper func. Gets the desciption created by the analysis."""
-    res = ""
+        if i[0] == analyze.LEVEL_NONE and i[1] == title:
+            return i[2]
+
+
+def bucketMessages(messages):
+    """Sorts messages by level in one pass. Returns the description and a dict of
+    the messages per level, each in reporting order."""
+    description = ""
+    buckets = {level: [] for level, _, _ in SEVERITIES}
     for i in messages:
         if (i[0] == 0):
-            res = i[2]
-    return res
+            description = i[2]
+        elif i[0] in buckets:
+            buckets[i[0]].append(i)
+    return description, buckets
 
 
-def genFullHtmlResponse(url):
-    """Runs an analysis and returns a full HTML page with the response."""
-    msgs = analyze.doAnalysis(url=url)
-    crit, warn, info = getSummaryHTML(msgs)
-    details = getDetailsHTML(msgs)
-    response = htmlTemplate.format(ph=url,
-                                   description="""<a href="{}">{}</a>""".format(
-                                       url, getDescr(msgs)),
-                                   summary_critical=crit,
-                                   summary_warning=warn,
-                                   summary_info=info,
-                                   details=details)
-    return response
+def getSummaryHTML(buckets):
+    """Helper func. Generates the summary secion of the HTML page."""
+    summaries = []
+    for level, _, _ in SEVERITIES:
+        out = []
+        for i in buckets[level]:
+            renderTemplate(_buttonParts[level], i, out)
+        summaries.append(''.join(out) or _noneFound[level])
+    return summaries
+
+
+def getDetailsHTML(buckets):
+    """Helper func. Generates detailes section of the HTML page."""
+    out = []
+    for level, _, _ in SEVERITIES:
+        for i in buckets[level]:
+            renderTemplate(_detailParts[level], i, out)
+    return ''.join(out)
+
+
+# Timeline charts, in order: statistic, label, unit, color
+CHARTS = (('dropped', "Dropped frames (network)", "%", "#e74c3c"),
+          ('lagged', "Lagged frames (rendering)", "%", "#f39c12"),
+          ('skipped', "Skipped frames (encoding)", "%", "#3498db"),
+          ('buffering', "Audio buffering", " ms", "#00bc8c"))
+
 
+def getTimelineHTML(timeline):
+    """Helper func. Draws the timeline as one SVG line chart per statistic, on a shared time axis."""
+    if not timeline:
+        return ""
+    span = max(series[-1][0] for series in timeline.values()) or 1
+    charts = []
+    for stat, label, unit, color in CHARTS:
+        series = timeline.get(stat)
+        if not series:
+            continue
+        peak = max(v for _, v in series)
+        scale = 44 / peak if peak > 0 else 0
+        points = " ".join("{:.1f},{:.1f}".format(t * 600 / span, 46 - v * scale) for t, v in series)
+        charts.append(htmlChart.format(label=label, peak="{:g}".format(peak), unit=unit, color=color, points=points))
+    return htmlTimeline.format(charts=''.join(charts))
 
+
+def genFullHtmlResponse(url, msgs):
+    """Returns a full HTML page with the results of an analysis."""
+    description, buckets = bucketMessages(msgs)
+    crit, warn, info = getSummaryHTML(buckets)
+    out = []
+    renderTemplate(_pageParts, {"ph": url,
+                                "description": """<a href="{}">{}</a>""".format(url, description),
+                                "summary_critical": crit,
+                                "summary_warning": warn,
+                                "summary_info": info,
+                                "timeline": getTimelineHTML(dataMessage(msgs, analyze.TIMELINE_TITLE)),
+                                "details": getDetailsHTML(buckets)}, out)
+    return ''.join(out)
+
+
+@functools.lru_cache(maxsize=1)
 def genEmptyHtmlResponse():
-    """Generates a full HTML page with no analysis."""
+    """Generates a full HTML page with no analysis. It is static, so it is only rendered once."""
     no_log = "Please analyze a log first."
     response_body = htmlTemplate.format(ph="",
                                         description="no log",
                                         summary_critical=no_log,
                                         summary_warning=no_log,
                                         summary_info=no_log,
+                                        timeline="",
                                         details="""<p class="text-warning">""" + no_log + """</p>""")
     return response_body
 
 
-def genJsonResponse(url, detailed):
-    """Runs an analysis and returns the results as JSON."""
-    msgs = []
-    msgs = analyze.doAnalysis(url=url)
+def genJsonResponse(msgs, detailed):
+    """Returns the results of an analysis as JSON."""
     critical = []
     warning = []
     info = []
@@ -126,11 +348,163 @@ def genJsonResponse(url, detailed):
             warning.append(entry)
         elif (i[0] == 1):
             info.append(entry)
-    return {"critical": critical, "warning": warning, "info": info}
+    return {"critical": critical, "warning": warning, "info": info,
+            "sessions": dataMessage(msgs, analyze.SESSIONS_TITLE) or [],
+            "timeline": dataMessage(msgs, analyze.TIMELINE_TITLE) or {}}
+
+
+# Responses
+# --------------------------------------
+
+minCompressBytes = 1024
+_responseStats = {"responses": 0, "notModified": 0, "bodyBytes": 0, "sentBytes": 0}
+
+
+def responseTag(*parts):
+    """Strong ETag (without quotes) of a response that is fully determined by parts.
+    Parts are small: an analysis is represented by its precomputed Analysis.tag."""
+    tag = hashlib.sha256(renderStamp.encode('utf-8'))
+    for part in parts:
+        tag.update(json.dumps(part).encode('utf-8'))
+    return tag.hexdigest()[:32]
+
+
+def negotiateEncoding(acceptEncoding):
+    """Picks the content coding for an Accept-Encoding header: br if brotli is installed, else gzip, else None."""
+    accepted = set()
+    for item in acceptEncoding.lower().split(','):
+        coding, _, params = item.partition(';')
+        params = params.replace(' ', '')
+        try:
+            q = float(params[2:]) if params.startswith('q=') else 1
+        except ValueError:
+            q = 1
+        if q > 0:
+            accepted.add(coding.strip())
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def etagMatches(ifNoneMatch, etag):
+    """Whether an If-None-Match header matches etag. The comparison is weak, as
+    it should be for GET and HEAD: intermediaries may send the tag back as W/"..."."""
+    if ifNoneMatch is None:
+        return False
+    if ifNoneMatch.strip() == '*':
+        return True
+    for t in ifNoneMatch.split(','):
+        t = t.strip()
+        if t.startswith('W/'):
+            t = t[2:]
+        if t == etag:
+            return True
+    return False
+
+
+def encodeBody(render, encoding, format):
+    """Runs in the thread pool: renders a body and compresses it with encoding, if it
+    is worth it. Returns the body and its size before compression."""
+    start = time.perf_counter()
+    body = render().encode('utf-8')
+    renderSeconds.observe(time.perf_counter() - start, format)
+    size = len(body)
+    if encoding is not None and size >= minCompressBytes:
+        body = brotli.compress(body, quality=5) if encoding == 'br' else gzip.compress(body, compresslevel=6)
+    return body, size
+
+
+async def encodedResponse(request, tag, render, contentType):
+    """Returns a compressed response with an ETag for a body identified by tag. render is
+    only called if the client doesn't have the body already, otherwise it gets a 304.
+    Rendering and compression run in the thread pool, off the event loop."""
+    encoding = negotiateEncoding(request.headers.get('Accept-Encoding', ''))
+    # Each coding of the body is a different representation, with its own tag
+    etag = '"{}{}"'.format(tag, '' if encoding is None else '-' + encoding)
+    headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    _responseStats["responses"] += 1
+    if etagMatches(request.headers.get('If-None-Match'), etag):
+        _responseStats["notModified"] += 1
+        return web.Response(status=304, headers=headers)
+    loop = asyncio.get_running_loop()
+    body, size = await loop.run_in_executor(None, encodeBody, render, encoding, contentType.rpartition('/')[2])
+    _responseStats["bodyBytes"] += size
+    if encoding is not None and size >= minCompressBytes:
+        headers['Content-Encoding'] = encoding
+    _responseStats["sentBytes"] += len(body)
+    return web.Response(body=body, headers=headers, content_type=contentType, charset='utf-8')
+
+
+def responseStats():
+    """Counters of the responses sent through encodedResponse. saved is what compression saved, in bytes."""
+    stats = dict(_responseStats)
+    stats["saved"] = stats["bodyBytes"] - stats["sentBytes"]
+    return stats
 
 
-def sync_request_handler(request):
-    """Non-async request handler processed within the thread pool. Do not share global resources without a Lock."""
+def htmlResponse(request, url, analysis):
+    return encodedResponse(request, responseTag('html', url, analysis.tag),
+                           lambda: genFullHtmlResponse(url, analysis.msgs), 'text/html')
+
+
+def jsonResponse(request, analysis, detailed):
+    return encodedResponse(request, responseTag('json', detailed, analysis.tag),
+                           lambda: json.dumps(genJsonResponse(analysis.msgs, detailed)), 'application/json')
+
+
+def emptyHtmlResponse(request):
+    return encodedResponse(request, responseTag('html'), genEmptyHtmlResponse, 'text/html')
+
+
+def emptyJsonResponse(request):
+    return encodedResponse(request, responseTag('json'), lambda: '{}', 'application/json')
+
+
+# Metrics
+# --------------------------------------
+
+fetchSeconds = metrics.Histogram('loganalyzer_fetch_seconds', 'Time to download a log, failed downloads included.',
+                                 metrics.LATENCY_BUCKETS, 'provider')
+renderSeconds = metrics.Histogram('loganalyzer_render_seconds', 'Time to render a response body.', metrics.LATENCY_BUCKETS, 'format')
+
+
+def _queueDepth():
+    # Tasks waiting for a worker thread
+    return threadPool._work_queue.qsize() if threadPool is not None else 0
+
+
+def _cacheStats(key):
+    stats = {"analysis": analysisCache.stats()[key]}
+    if key == "hits":
+        # Misses of the negative cache are the analysis cache misses that are fetched
+        stats["negative"] = fetchers.negativeCache.stats()["hits"]
+    if resultStore is not None:
+        stats["store"] = resultStore.stats()[key]
+    return stats
+
+
+metrics.Collected('loganalyzer_threadpool_queue_depth', 'Tasks waiting for a thread of the analysis pool.', 'gauge', _queueDepth)
+metrics.Collected('loganalyzer_analyses_inflight', 'Fetches and analyses in progress.', 'gauge', lambda: analysisFlights.stats()["inflight"])
+metrics.Collected('loganalyzer_coalesced_requests_total', 'Requests that waited for an analysis already in progress.', 'counter',
+                  lambda: analysisFlights.stats()["coalesced"])
+metrics.Collected('loganalyzer_cache_hits_total', 'Cache lookups that found an entry.', 'counter', lambda: _cacheStats("hits"), 'cache')
+metrics.Collected('loganalyzer_cache_misses_total', 'Cache lookups that found nothing.', 'counter', lambda: _cacheStats("misses"), 'cache')
+metrics.Collected('loganalyzer_responses_total', 'Responses sent, 304s included.', 'counter', lambda: _responseStats["responses"])
+metrics.Collected('loganalyzer_not_modified_total', 'Responses answered with 304 Not Modified.', 'counter', lambda: _responseStats["notModified"])
+metrics.Collected('loganalyzer_response_bytes_total', 'Response body bytes, before and after compression.', 'counter',
+                  lambda: {"uncompressed": _responseStats["bodyBytes"], "sent": _responseStats["sentBytes"]}, 'stage')
+
+
+async def metrics_handler(request):
+    """Serves the metrics in the Prometheus text format."""
+    return web.Response(body=metrics.exposition().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+async def request_handler(request):
+    """Async request handler. Logs are downloaded on the event loop; the analysis is submitted to the thread pool."""
     query = request.query  # Get HTTP query string as a MultiDict
     format = 'html'
     if 'format' in query:  # Check for requested response format
@@ -141,42 +515,48 @@ def sync_request_handler(request):
     if 'url' in query:
         url = query['url']
         detailed = 'detailed' in query and query['detailed'] == 'true'
-        if not checkUrl(url):  # Return empty data/page if URL is invalid
+        target = checkUrl(url)
+        if target is None:  # Return empty data/page if URL is invalid
             logging.info('Invalid URL: {}'.format(url))
             if format == 'json':
                 logging.info('Returning empty JSON response.')
-                return web.json_response({})
+                return await emptyJsonResponse(request)
             else:
                 logging.info('Returning default HTML response.')
-                return web.Response(text=genEmptyHtmlResponse(), content_type='text/html')
+                return await emptyHtmlResponse(request)
         if format == 'json':
             logging.info('Returning JSON response for url: {}'.format(url))
-            response = genJsonResponse(url, detailed)
-            return web.json_response(response)
+            analysis = await getAnalysis(request.app['fetchSession'], url, target)
+            response = await jsonResponse(request, analysis, detailed)
         else:
             logging.info('Returning HTML response for url: {}'.format(url))
-            return web.Response(text=genFullHtmlResponse(url), content_type='text/html')
+            analysis = await getAnalysis(request.app['fetchSession'], url, target)
+            response = await htmlResponse(request, url, analysis)
+        logging.info('Responses: {}'.format(responseStats()))
+        return response
     else:
         if format == 'json':
             logging.info('Returning empty JSON response.')
-            return web.json_response({})
+            return await emptyJsonResponse(request)
         else:
             logging.info('Returning default HTML response.')
-            return web.Response(text=genEmptyHtmlResponse(), content_type='text/html')
-
-
-async def request_handler(request):
-    """Async request handler. Submits the incoming request to the thread pool to be handled."""
-    return await asyncio.to_thread(sync_request_handler, request)  # Submits the request to a handler inside the threadpool
+            return await emptyHtmlResponse(request)
 
 
 async def on_startup(app):
+    global threadPool
     threadPool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='loganalyzer: worker thread')
     loop = asyncio.get_running_loop()
     loop.set_default_executor(threadPool)  # Set the default executor to our thread pool
+    app['fetchSession'] = asyncfetchers.createSession()
+
+
+async def on_cleanup(app):
+    await app['fetchSession'].close()
 
 
 def main():
+    global resultStore
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] [%(funcName)s] %(message)s")
     aiohttpLogger = logging.getLogger('aiohttp')
     aiohttpLogger.setLevel(logging.WARNING)
@@ -184,11 +564,31 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", default="localhost", type=str, help="address to bind to", dest='host')
     parser.add_argument("--port", default="8080", type=int, help="port to bind to", dest='port')
+    parser.add_argument("--cache-size", default=256, type=int, help="number of analyses to cache, 0 disables the cache", dest='cacheSize')
+    parser.add_argument("--cache-ttl", default=3600, type=int, help="seconds an analysis stays cached", dest='cacheTtl')
+    parser.add_argument("--store", default=None, type=str, help="SQLite file to keep analyses in across restarts", dest='store')
+    parser.add_argument("--store-size", default=512, type=int, help="size cap of the store in MB", dest='storeSize')
+    parser.add_argument("--connect-timeout", default=fetchers.connectTimeout, type=float, help="seconds to wait for a log host to accept the connection", dest='connectTimeout')
+    parser.add_argument("--read-timeout", default=fetchers.readTimeout, type=float, help="seconds to wait for data from a log host", dest='readTimeout')
+    parser.add_argument("--total-timeout", default=fetchers.totalTimeout, type=float, help="seconds a log download may take in all", dest='totalTimeout')
+    parser.add_argument("--negative-ttl", default=fetchers.negativeCache.ttl, type=int, help="seconds a failed fetch is remembered, 0 disables it", dest='negativeTtl')
+    parser.add_argument("--max-log-size", default=fetchers.maxLogBytes // (1024 * 1024), type=int, help="largest log in MB that is fetched", dest='maxLogSize')
     flags = parser.parse_args()
+    analysisCache.maxEntries = flags.cacheSize
+    analysisCache.ttl = flags.cacheTtl
+    fetchers.connectTimeout = flags.connectTimeout
+    fetchers.readTimeout = flags.readTimeout
+    fetchers.totalTimeout = flags.totalTimeout
+    fetchers.maxLogBytes = flags.maxLogSize * 1024 * 1024
+    fetchers.negativeCache.ttl = flags.negativeTtl
+    if flags.store is not None:
+        resultStore = analyze.ResultStore(flags.store, analyze.getAnalyzerVersion(), flags.storeSize * 1024 * 1024)
 
     app = web.Application()
     app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
     app.router.add_get('/', request_handler)
+    app.router.add_get('/metrics', metrics_handler)
     web.run_app(app, host=flags.host, port=flags.port)
 
 